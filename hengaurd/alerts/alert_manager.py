@@ -1,50 +1,184 @@
+import heapq
 import threading
 import time
 import logging
+from utils.metrics import Counter, Gauge, Histogram
+
+ALERTS = Counter.create(
+    "henguard_alerts_total", "Alerts by outcome (sent, partial, failed, cooldown, coalesced, dropped)", ["outcome"]
+)
+CHANNEL_RESULTS = Counter.create("henguard_alert_channel_total", "Alert channel results", ["channel", "outcome"])
+DISPATCH_SECONDS = Histogram.create(
+    "henguard_alert_dispatch_seconds", "Time from trigger to each alert channel finishing", ["channel"],
+    buckets=(0.1, 0.5, 1, 2, 5, 10, 20, 30, 60),
+)
+QUEUE_DEPTH = Gauge.create("henguard_alert_queue_depth", "Alerts waiting for the dispatcher")
+
+# Lower value = more urgent
+PRIORITY_THEFT = 0
+PRIORITY_OFFLINE = 1
+PRIORITY_DEFAULT = 2
+
+def alert_priority(msg):
+    if msg.startswith("HEN THEFT"):
+        return PRIORITY_THEFT
+    if msg.startswith("CAMERA OFFLINE"):
+        return PRIORITY_OFFLINE
+    return PRIORITY_DEFAULT
 
 class AlertManager:
-    def __init__(self, buzzer, gsm, cooldown, logger=None, continuous_alarm=False):
+    """Delivers alerts from one long-lived dispatcher thread.
+
+    trigger() never blocks: the cooldown is decided there (a more urgent alert may still go out
+    during the cooldown of a less urgent one), a message that is already queued or was accepted
+    within `coalesce_window` seconds is folded into that alert, and accepted alerts go into a
+    bounded priority queue, so HEN THEFT is always sent before a pending CAMERA OFFLINE. When the
+    queue is full the least urgent alert is dropped.
+
+    The gsm channel (and the alert's sent/partial/failed outcome) is recorded when SIM900 reports
+    the SMS's final result, not when it is queued, so its latency covers the actual send.
+    """
+
+    def __init__(self, buzzer, gsm, cooldown, logger=None, continuous_alarm=False, max_queue=8,
+                 coalesce_window=None):
         self.buzzer = buzzer
         self.gsm = gsm
         self.cooldown = cooldown
         self.last_alert_time = 0
         self.continuous_alarm = continuous_alarm
         self.logger = logger or logging.getLogger(__name__)
+        self.max_queue = max_queue
+        self.coalesce_window = cooldown if coalesce_window is None else coalesce_window
+        self.stats = {channel: {"ok": 0, "failed": 0, "last_latency": None} for channel in ("buzzer", "gsm")}
+        self._stats_lock = threading.Lock()
+        self._last_priority = PRIORITY_DEFAULT
+        self._recent = {}       # msg -> time it was last accepted
+        self._pending = {}      # msg -> queue entry [priority, seq, msg, triggered_at, count]
+        self._queue = []
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread = threading.Thread(target=self._dispatch_loop, name="alert-dispatcher", daemon=True)
+        self._thread.start()
+
+    def trigger(self, msg, priority=None):
+        """Queue an alert; returns True if it was accepted (not cooled down, coalesced or dropped)."""
+        priority = alert_priority(msg) if priority is None else priority
+        now = time.time()
+        with self._cond:
+            entry = self._pending.get(msg)
+            if entry is not None or now - self._recent.get(msg, float("-inf")) < self.coalesce_window:
+                if entry is not None:
+                    entry[4] += 1
+                ALERTS.inc(outcome="coalesced")
+                return False
+            if now - self.last_alert_time < self.cooldown and priority >= self._last_priority:
+                self.logger.info("Alert cooldown active. Skipping alert.")
+                ALERTS.inc(outcome="cooldown")
+                return False
 
-    def trigger(self, msg):
-        if time.time() - self.last_alert_time < self.cooldown:
-            self.logger.info("Alert cooldown active. Skipping alert.")
-            return
-        threading.Thread(target=self._run_alert, args=(msg,), daemon=True).start()
+            if len(self._queue) >= self.max_queue:
+                worst = max(self._queue)
+                if priority >= worst[0]:
+                    self.logger.warning(f"Alert queue full. Dropping alert: {msg}")
+                    ALERTS.inc(outcome="dropped")
+                    return False
+                self._queue.remove(worst)
+                heapq.heapify(self._queue)
+                del self._pending[worst[2]]
+                self.logger.warning(f"Alert queue full. Dropping less urgent alert: {worst[2]}")
+                ALERTS.inc(outcome="dropped")
 
-    def _run_alert(self, msg):
+            self._seq += 1
+            entry = [priority, self._seq, msg, now, 1]
+            heapq.heappush(self._queue, entry)
+            self._pending[msg] = entry
+            self._recent[msg] = now
+            self.last_alert_time = now
+            self._last_priority = priority
+            QUEUE_DEPTH.set(len(self._queue))
+            self._cond.notify()
+        return True
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._stop:
+                    self._cond.wait()
+                if self._stop:
+                    return
+                priority, _, msg, triggered_at, count = heapq.heappop(self._queue)
+                del self._pending[msg]
+                QUEUE_DEPTH.set(len(self._queue))
+                # Forget coalescing state for messages that are out of the window
+                cutoff = time.time() - self.coalesce_window
+                self._recent = {m: t for m, t in self._recent.items() if t >= cutoff}
+            if count > 1:
+                self.logger.info(f"Alert '{msg}' coalesced {count} triggers")
+            try:
+                self._run_alert(msg, triggered_at)
+            except Exception as e:
+                self.logger.error(f"Alert dispatch failed: {e}")
+
+    def _run_alert(self, msg, triggered_at):
         self.logger.info(f"Triggering alert: {msg}")
         buzzer_success = False
-        gsm_success = False
 
         try:
             if self.continuous_alarm:
-                self.buzzer.start_alarm()
-                buzzer_success = True
+                self.buzzer.beep_or_continuous()
             else:
-                buzzer_success = self.buzzer.beep()
+                self.buzzer.beep_or_continuous(times=3)
+            buzzer_success = True
         except Exception as e:
             self.logger.error(f"Buzzer alert failed: {e}")
+        self._record_channel("buzzer", buzzer_success, triggered_at)
 
         try:
-            gsm_success = self.gsm.send_sms(msg)
+            # SIM900 stores the text in its outbox and returns; the result comes back once the SMS is
+            # delivered (delivery_reports) or accepted by the network, or the outbox gives up on it
+            queued = self.gsm.send_sms(
+                msg, on_result=lambda ok: self._finish_alert(msg, triggered_at, buzzer_success, ok)
+            )
         except Exception as e:
             self.logger.error(f"GSM alert failed: {e}")
+            queued = False
+        if not queued:
+            self._finish_alert(msg, triggered_at, buzzer_success, False)
 
-        self.last_alert_time = time.time()
-
+    def _finish_alert(self, msg, triggered_at, buzzer_success, gsm_success):
+        self._record_channel("gsm", gsm_success, triggered_at)
         if buzzer_success and gsm_success:
+            ALERTS.inc(outcome="sent")
             self.logger.warning(f"Alert triggered successfully: {msg}")
         elif buzzer_success or gsm_success:
+            ALERTS.inc(outcome="partial")
             self.logger.warning(f"Partial alert success: {msg}")
         else:
+            ALERTS.inc(outcome="failed")
             self.logger.error(f"Alert failed completely: {msg}")
 
+    def _record_channel(self, channel, success, triggered_at):
+        # gsm results arrive on the SIM900 threads, buzzer results on the dispatcher
+        latency = time.time() - triggered_at
+        outcome = "ok" if success else "failed"
+        with self._stats_lock:
+            stats = self.stats[channel]
+            stats[outcome] += 1
+            stats["last_latency"] = latency
+        CHANNEL_RESULTS.inc(channel=channel, outcome=outcome)
+        DISPATCH_SECONDS.observe(latency, channel=channel)
+        self.logger.info(f"Alert channel {channel}: {outcome} after {latency:.2f}s")
+
+    def close(self, timeout=5):
+        """Stop the dispatcher after the alert in progress; queued alerts are discarded."""
+        with self._cond:
+            self._stop = True
+            if self._queue:
+                self.logger.warning(f"Discarding {len(self._queue)} queued alerts on shutdown")
+            self._cond.notify_all()
+        self._thread.join(timeout=timeout)
+
     def stop_continuous_alarm(self):
         if self.continuous_alarm:
             try:
@@ -0,0 +1,167 @@
+"""Pseudo-terminal SIM900 stand-in for exercising the GSM driver without hardware.
+
+    python3 -m alerts.fake_modem --alerts 50 --rate 10 --send-delay 3 --fail-rate 0.1
+
+Queues alerts through SIM900.send_sms() against the fake modem and reports how many SMS were
+needed, how many alerts each carried and the queue-to-confirmation and queue-to-delivery latency. FakeModem(...).port
+can also be used directly as `alerts.gsm.port`.
+"""
+import argparse
+import os
+import pty
+import random
+import select
+import tempfile
+import threading
+import time
+import tty
+
+class FakeModem:
+    """Answers the AT subset HenGuard uses on the master side of a pty.
+
+    Supports AT, ATE0/ATE1, AT+CMGF, AT+CSMP, AT+CNMI, ATD/ATH and AT+CMGS with the '> ' prompt.
+    Each SMS takes `send_delay` seconds and fails with +CMS ERROR at `fail_rate`; with delivery
+    reports enabled (AT+CNMI=...,1,...) a +CDS URC follows. urc() injects arbitrary URCs.
+    """
+
+    def __init__(self, send_delay=0.5, fail_rate=0.0, delivery_delay=1.0, seed=None):
+        self.send_delay = send_delay
+        self.fail_rate = fail_rate
+        self.delivery_delay = delivery_delay
+        self.echo = True
+        self.delivery_reports = False
+        self.sent = []              # (time, text) of every accepted SMS
+        self.commands = []
+        self._random = random.Random(seed)
+        self._mr = 0
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="fake-modem", daemon=True)
+        self._thread.start()
+
+    def urc(self, line):
+        self._reply(f"\r\n{line}\r\n")
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=2)
+        for fd in (self._master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def _reply(self, text):
+        with self._write_lock:
+            os.write(self._master, text.encode())
+
+    def _run(self):
+        buf = b""
+        sms_text = None
+        while not self._stop.is_set():
+            ready, _, _ = select.select([self._master], [], [], 0.1)
+            if not ready:
+                continue
+            try:
+                buf += os.read(self._master, 1024)
+            except OSError:
+                return
+            while buf:
+                if sms_text is not None:
+                    end = min((i for i in (buf.find(b"\x1a"), buf.find(b"\x1b")) if i >= 0), default=-1)
+                    if end < 0:
+                        break
+                    text, terminator, buf = buf[:end], buf[end:end + 1], buf[end + 1:]
+                    if terminator == b"\x1a":
+                        self._send_sms(sms_text, text.decode(errors='replace'))
+                    else:
+                        self._reply("\r\nOK\r\n")  # ESC aborts the message
+                    sms_text = None
+                    continue
+                end = buf.find(b"\r")
+                if end < 0:
+                    break
+                line, buf = buf[:end].decode(errors='ignore').strip(), buf[end + 1:].lstrip(b"\n")
+                if line:
+                    sms_text = self._handle(line)
+
+    def _handle(self, line):
+        """Answer one command; returns the SMS destination when a text is expected next."""
+        self.commands.append(line)
+        if self.echo:
+            self._reply(line + "\r\n")
+        cmd = line.upper()
+        if cmd.startswith("AT+CMGS="):
+            self._reply("\r\n> ")
+            return line[8:].strip('"')
+        if cmd in ("ATE0", "ATE1"):
+            self.echo = cmd == "ATE1"
+        elif cmd.startswith("AT+CNMI="):
+            fields = cmd[8:].split(",")
+            self.delivery_reports = len(fields) > 3 and fields[3] == "1"
+        elif cmd not in ("AT", "AT+CMGF=1", "ATH") and not cmd.startswith(("AT+CSMP=", "ATD")):
+            self._reply("\r\nERROR\r\n")
+            return None
+        self._reply("\r\nOK\r\n")
+        return None
+
+    def _send_sms(self, phone, text):
+        time.sleep(self.send_delay)
+        if self._random.random() < self.fail_rate:
+            self._reply("\r\n+CMS ERROR: 500\r\n")
+            return
+        self._mr = self._mr % 255 + 1
+        self.sent.append((time.time(), text))
+        self._reply(f"\r\n+CMGS: {self._mr}\r\n\r\nOK\r\n")
+        if self.delivery_reports:
+            mr = self._mr
+            threading.Timer(
+                self.delivery_delay, self.urc,
+                args=(f'+CDS: 6,{mr},"{phone}",145,"24/01/01,00:00:00+00","24/01/01,00:00:05+00",0',),
+            ).start()
+
+def main():
+    import numpy as np
+    from utils.logger import setup_logger
+    from alerts.gsm_manager import SIM900
+
+    parser = argparse.ArgumentParser(description="SIM900 driver throughput/latency test against a fake modem")
+    parser.add_argument("--alerts", type=int, default=30, help="Alerts to queue")
+    parser.add_argument("--rate", type=float, default=10, help="Alerts queued per second")
+    parser.add_argument("--send-delay", type=float, default=2.0, help="Seconds the fake modem takes per SMS")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of SMS that fail with +CMS ERROR")
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    logger = setup_logger()
+    modem = FakeModem(send_delay=args.send_delay, fail_rate=args.fail_rate, seed=0)
+    with tempfile.TemporaryDirectory() as tmp:
+        gsm = SIM900({
+            'port': modem.port, 'baud': 9600, 'phone': "+10000000000",
+            'outbox_path': os.path.join(tmp, "outbox.json"), 'retry_base': 1, 'delivery_reports': True,
+        }, logger)
+        results = []
+        start = time.time()
+        for i in range(args.alerts):
+            gsm.send_sms(f"HEN THEFT DETECTED [cam{i % 3}]", on_result=results.append)
+            time.sleep(1.0 / args.rate)
+        while len(results) < args.alerts and time.time() - start < args.timeout:
+            time.sleep(0.1)
+        elapsed = time.time() - start
+        gsm.cleanup()
+    modem.close()
+
+    print(f"{gsm.stats['alerts_sent']}/{args.alerts} alerts in {gsm.stats['sms_sent']} SMS "
+          f"({gsm.stats['failures']} failed attempts) in {elapsed:.1f}s; "
+          f"{gsm.stats['delivered']} delivered, {results.count(False)} failed")
+    for label, key in (("sent", "latencies"), ("delivered", "delivery_latencies")):
+        latencies = np.asarray(gsm.stats[key])
+        if latencies.size:
+            print(f"{label} latency p50 {np.percentile(latencies, 50):.2f}s  "
+                  f"p95 {np.percentile(latencies, 95):.2f}s  max {latencies.max():.2f}s")
+
+if __name__ == "__main__":
+    main()
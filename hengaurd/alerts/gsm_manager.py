@@ -1,66 +1,348 @@
 import serial
+import queue
+import threading
 import time
 import logging
+from collections import deque
+from alerts.sms_outbox import SmsOutbox, compose
+from utils.metrics import Counter, Histogram
+
+SMS_SENT = Counter.create("henguard_sms_sent_total", "SMS accepted by the network (+CMGS)")
+SMS_ALERTS = Counter.create("henguard_sms_alerts_total", "Alerts delivered by SMS (several may share one SMS)")
+SMS_FAILURES = Counter.create("henguard_sms_send_failures_total", "Failed SMS send attempts")
+SMS_LATENCY = Histogram.create(
+    "henguard_sms_latency_seconds", "Time from queuing an alert to the network accepting its SMS",
+    buckets=(1, 2, 5, 10, 20, 30, 60, 120, 300),
+)
+SMS_DELIVERY = Counter.create(
+    "henguard_sms_delivery_total", "Delivery reports (+CDS) by outcome (delivered, failed, timeout)", ["outcome"]
+)
+SMS_DELIVERY_LATENCY = Histogram.create(
+    "henguard_sms_delivery_latency_seconds", "Time from queuing an alert to its delivery report",
+    buckets=(2, 5, 10, 20, 30, 60, 120, 300, 600),
+)
+
+# Unsolicited result codes the SIM900 may emit at any time, even in the middle of a command
+URC_PREFIXES = (
+    "RING", "NO CARRIER", "+CMTI:", "+CDS:", "+CLIP:", "+CREG:", "+CPIN:", "+CFUN:",
+    "Call Ready", "SMS Ready", "RDY", "UNDER-VOLTAGE", "OVER-VOLTAGE", "NORMAL POWER DOWN",
+)
+
+class AtCommand:
+    """One queued AT request and, once done, its response lines and final result."""
+
+    def __init__(self, cmd, timeout=5, payload=None):
+        self.cmd = cmd
+        self.timeout = timeout
+        self.payload = payload      # text sent after the '> ' prompt (AT+CMGS)
+        self.lines = []
+        self.ok = False
+        self.error = None
+        self.done = threading.Event()
+
+    def finish(self, ok, error=None):
+        if not self.done.is_set():
+            self.ok = ok
+            self.error = error
+            self.done.set()
 
 class SIM900:
+    """Event-driven SIM900 driver.
+
+    A reader thread parses everything the modem sends into command responses, the '> ' SMS
+    prompt and URCs (handed to `urc_handlers`). Commands are queued and executed one at a time by
+    a command thread, so callers never poll the port. Alerts go through a persistent SmsOutbox:
+    send_sms() stores the text and returns, and a sender thread batches whatever is pending into
+    one SMS, confirms it through the +CMGS reply and retries with backoff on failure.
+
+    The final result of each alert goes to its send_sms(on_result=...) callback: with
+    delivery_reports, once the +CDS report for the SMS's +CMGS message reference arrives (or
+    `delivery_timeout` passes without one); otherwise as soon as the network accepts the SMS.
+    An alert the outbox gives up on reports failure.
+    """
+
     def __init__(self, cfg, logger=None):
         self.logger = logger or logging.getLogger(__name__)
         self.phone = cfg['phone']
+        self.delivery_reports = cfg.get('delivery_reports', False)
+        self.delivery_timeout = cfg.get('delivery_timeout', 600)
+        self.urc_handlers = [self._on_urc]
+        self.stats = {
+            "sms_sent": 0, "alerts_sent": 0, "failures": 0, "latencies": deque(maxlen=1000),
+            "delivered": 0, "undelivered": 0, "delivery_latencies": deque(maxlen=1000),
+        }
+        self._listeners = {}    # outbox item id -> on_result callback
+        self._awaiting = {}     # +CMGS message reference -> (sent_at, batch) waiting for +CDS
+        self._delivery_lock = threading.Lock()
+        self._commands = queue.Queue()
+        self._active = None
+        self._active_lock = threading.Lock()
+        self._prompt = threading.Event()
+        self._stop = threading.Event()
         try:
-            self.ser = serial.Serial(cfg['port'], cfg['baud'], timeout=1)
+            self.ser = serial.Serial(cfg['port'], cfg['baud'], timeout=0.1)
             self.logger.info("SIM900 initialized")
         except Exception as e:
             self.logger.error(f"Failed to open serial port: {e}")
             raise
-        
-        if not self._send("AT"):
+
+        self._reader = threading.Thread(target=self._read_loop, name="sim900-reader", daemon=True)
+        self._writer = threading.Thread(target=self._command_loop, name="sim900-commands", daemon=True)
+        self._reader.start()
+        self._writer.start()
+
+        if not self.command("AT").ok:
             self.logger.warning("SIM900 not responding to AT")
-        if not self._send("AT+CMGF=1"):
+        self.command("ATE0")  # no echo: responses are easier to tell apart
+        if not self.command("AT+CMGF=1").ok:
             self.logger.warning("Failed to set SMS text mode")
+        if self.delivery_reports:
+            # Request status reports and have them pushed as +CDS URCs
+            self.command("AT+CSMP=49,167,0,0")
+            self.command("AT+CNMI=2,1,0,1,0")
+
+        self.outbox = SmsOutbox(
+            cfg.get('outbox_path', 'logs/sms_outbox.json'), self.logger,
+            max_attempts=cfg.get('max_attempts', 10), retry_base=cfg.get('retry_base', 5),
+        )
+        self._sender = threading.Thread(target=self._send_loop, name="sim900-sender", daemon=True)
+        self._sender.start()
 
-    def _send(self, cmd, wait="OK", timeout=5):
+    # ---------------- commands ----------------
+    def command(self, cmd, timeout=5, payload=None, wait=True):
+        """Queue an AT command; with wait, block until it completes. Returns the AtCommand."""
+        request = AtCommand(cmd, timeout, payload)
+        if self._stop.is_set():
+            request.finish(False, "driver closed")
+            return request
+        self._commands.put(request)
+        if wait:
+            request.done.wait()
+        return request
+
+    def _command_loop(self):
+        while True:
+            request = self._commands.get()
+            if request is None or self._stop.is_set():
+                if request is not None:
+                    request.finish(False, "driver closed")
+                break
+            self._execute(request)
+        # Fail whatever is still queued so no caller waits forever
+        while not self._commands.empty():
+            request = self._commands.get_nowait()
+            if request is not None:
+                request.finish(False, "driver closed")
+
+    def _execute(self, request):
+        self._prompt.clear()
+        with self._active_lock:
+            self._active = request
         try:
-            self.ser.reset_input_buffer()
-            self.ser.write((cmd + "\r\n").encode())
-            end = time.time() + timeout
-            resp = ""
-            while time.time() < end:
-                n = self.ser.in_waiting
-                if n:
-                    resp += self.ser.read(n).decode(errors='ignore')
-                    if wait in resp:
-                        return True
-                time.sleep(0.05)
-            self.logger.warning(f"No response for command '{cmd}'")
-            return False
+            self.ser.write((request.cmd + "\r").encode())
+            if request.payload is not None:
+                # The reader also sets _prompt when the command fails before prompting
+                if not self._prompt.wait(5) or request.done.is_set():
+                    request.finish(False, "no SMS prompt")
+                    self.ser.write(b"\x1b")  # abort the pending input
+                    return
+                self.ser.write(request.payload.encode(errors='replace') + b"\x1a")
+            if not request.done.wait(request.timeout):
+                request.finish(False, "timeout")
+                self.logger.warning(f"No response for command '{request.cmd}'")
         except Exception as e:
-            self.logger.error(f"Error sending command '{cmd}': {e}")
+            request.finish(False, str(e))
+            self.logger.error(f"Error sending command '{request.cmd}': {e}")
+        finally:
+            with self._active_lock:
+                self._active = None
+
+    # ---------------- reader ----------------
+    def _read_loop(self):
+        buf = b""
+        while not self._stop.is_set():
+            try:
+                data = self.ser.read(self.ser.in_waiting or 1)
+            except Exception as e:
+                self.logger.error(f"SIM900 serial read failed: {e}")
+                self._stop.wait(1)
+                continue
+            if not data:
+                continue
+            *lines, buf = (buf + data).split(b"\n")
+            for raw in lines:
+                line = raw.decode(errors='ignore').strip()
+                if line:
+                    self._handle_line(line)
+            if buf.strip() == b">":
+                # SMS text prompt: "\r\n> " with no line ending
+                self._prompt.set()
+                buf = b""
+
+    def _handle_line(self, line):
+        with self._active_lock:
+            request = self._active
+        if request is not None and line == request.cmd:
+            return  # echo
+        if self._is_urc(line, request):
+            for handler in self.urc_handlers:
+                try:
+                    handler(line)
+                except Exception as e:
+                    self.logger.error(f"URC handler failed for '{line}': {e}")
+            return
+        if request is None:
+            self.logger.debug(f"Unsolicited modem output: {line}")
+            return
+        if line == "OK":
+            request.finish(True)
+        elif line == "ERROR" or line.startswith(("+CME ERROR", "+CMS ERROR")):
+            request.finish(False, line)
+        else:
+            request.lines.append(line)
+        if request.done.is_set():
+            self._prompt.set()
+
+    @staticmethod
+    def _is_urc(line, request):
+        prefix = next((p for p in URC_PREFIXES if line.startswith(p)), None)
+        if prefix is None:
             return False
+        # "+CREG: 0,1" answers AT+CREG? but is a URC while any other command runs
+        return request is None or prefix.rstrip(":") not in request.cmd
+
+    def _on_urc(self, line):
+        if line.startswith("+CDS:"):
+            # +CDS: <fo>,<mr>,...,<st>  (st 0 = delivered to the handset)
+            parts = line[5:].split(",")
+            try:
+                mr, status = int(parts[1]), int(parts[-1])
+            except (IndexError, ValueError):
+                self.logger.warning(f"Unparsable delivery report: {line}")
+                return
+            if 32 <= status < 64:
+                self.logger.info(f"SMS {mr} delivery still pending (status {status})")
+                return
+            with self._delivery_lock:
+                sent = self._awaiting.pop(mr, None)
+            if sent is None:
+                self.logger.info(f"Delivery report for unknown SMS {mr} (status {status})")
+                return
+            self._delivered(mr, sent[1], status == 0, "delivered" if status == 0 else f"status {status}")
+        else:
+            self.logger.info(f"SIM900: {line}")
+
+    # ---------------- SMS ----------------
+    def send_sms(self, msg, wait=False, timeout=120, on_result=None):
+        """Store msg in the outbox for sending; returns True once queued.
+
+        With wait=True, block until it was actually sent (True) or given up on / timed out (False).
+        on_result(ok) is called once the alert's final result is known (see the class docstring).
+        """
+        with self._delivery_lock:
+            item_id = self.outbox.add(msg)
+            if on_result is not None:
+                self._listeners[item_id] = on_result
+        if not wait:
+            return True
+        return bool(self.outbox.wait_done(item_id, timeout))
+
+    def _submit_sms(self, text):
+        """Send one SMS; returns the +CMGS message reference, or None on failure."""
+        request = self.command(f'AT+CMGS="{self.phone}"', timeout=60, payload=text)
+        if not request.ok:
+            self.logger.warning(f"SMS send failed: {request.error}")
+            return None
+        for line in request.lines:
+            if line.startswith("+CMGS:"):
+                return int(line[6:].strip())
+        self.logger.warning("SMS send returned OK without a +CMGS reference")
+        return None
+
+    def _send_loop(self):
+        while not self._stop.is_set():
+            batch = self.outbox.next_batch(timeout=1.0)
+            self._expire_deliveries()
+            if not batch or self._stop.is_set():
+                continue
+            mr = self._submit_sms(compose(batch, self.outbox.max_len))
+            if mr is None:
+                self.stats["failures"] += 1
+                SMS_FAILURES.inc()
+                dropped = self.outbox.mark_failed(batch, "no +CMGS confirmation")
+                self._notify([item for item in batch if item["id"] in dropped], False)
+                continue
+            now = time.time()
+            self.outbox.mark_sent(batch)
+            self.stats["sms_sent"] += 1
+            self.stats["alerts_sent"] += len(batch)
+            SMS_SENT.inc()
+            SMS_ALERTS.inc(len(batch))
+            for item in batch:
+                self.stats["latencies"].append(now - item["created"])
+                SMS_LATENCY.observe(now - item["created"])
+            self.logger.info(f"SMS {mr} sent with {len(batch)} alert(s)")
+            if not self.delivery_reports:
+                self._notify(batch, True)
+                continue
+            with self._delivery_lock:
+                # References wrap at 255; an old SMS still waiting under this one never got its report
+                previous = self._awaiting.pop(mr, None)
+                self._awaiting[mr] = (now, batch)
+            if previous is not None:
+                self._delivered(mr, previous[1], False, "reference reused before a delivery report")
+
+    def _expire_deliveries(self):
+        cutoff = time.time() - self.delivery_timeout
+        with self._delivery_lock:
+            expired = [(mr, batch) for mr, (sent_at, batch) in self._awaiting.items() if sent_at < cutoff]
+            for mr, _ in expired:
+                del self._awaiting[mr]
+        for mr, batch in expired:
+            self._delivered(mr, batch, False, f"no delivery report within {self.delivery_timeout}s", "timeout")
+
+    def _delivered(self, mr, batch, ok, detail, outcome=None):
+        now = time.time()
+        outcome = outcome or ("delivered" if ok else "failed")
+        SMS_DELIVERY.inc(outcome=outcome)
+        if ok:
+            self.stats["delivered"] += len(batch)
+            for item in batch:
+                self.stats["delivery_latencies"].append(now - item["created"])
+                SMS_DELIVERY_LATENCY.observe(now - item["created"])
+            self.logger.info(f"SMS {mr} delivered ({len(batch)} alert(s))")
+        else:
+            self.stats["undelivered"] += len(batch)
+            self.logger.warning(f"SMS {mr} not delivered: {detail}")
+        self._notify(batch, ok)
 
-    def send_sms(self, msg, retries=3):
-        for attempt in range(1, retries + 1):
-            if self._send(f'AT+CMGS="{self.phone}"', wait=">"):
-                self.ser.write((msg + "\x1A").encode())
-                self.logger.info(f"SMS sent on attempt {attempt}")
-                time.sleep(1)  # allow modem to process
-                return True
-            else:
-                self.logger.warning(f"SMS attempt {attempt} failed")
-                time.sleep(1)
-        self.logger.error("All SMS attempts failed")
-        return False
+    def _notify(self, batch, ok):
+        with self._delivery_lock:
+            callbacks = [self._listeners.pop(item["id"], None) for item in batch]
+        for callback in callbacks:
+            if callback is None:
+                continue
+            try:
+                callback(ok)
+            except Exception as e:
+                self.logger.error(f"SMS result callback failed: {e}")
 
     def make_call(self, duration=10):
         """Auto call, hang up after duration"""
-        if self._send(f'ATD{self.phone};'):
+        if self.command(f'ATD{self.phone};', timeout=20).ok:
             self.logger.info("Call started")
             time.sleep(duration)
-            self._send("ATH")
+            self.command("ATH")
             self.logger.info("Call ended")
         else:
             self.logger.error("Failed to start call")
 
     def cleanup(self):
+        self._stop.set()
+        self.outbox.wake()
+        self._commands.put(None)
+        for t in (self._sender, self._writer, self._reader):
+            t.join(timeout=2)
         try:
             self.ser.close()
             self.logger.info("SIM900 serial port closed")
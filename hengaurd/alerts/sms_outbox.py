@@ -0,0 +1,147 @@
+import json
+import logging
+import os
+import threading
+import time
+from utils.metrics import Gauge
+
+OUTBOX_DEPTH = Gauge.create("henguard_sms_outbox_depth", "Alerts waiting in the SMS outbox")
+
+SMS_MAX_LEN = 160  # one GSM 7-bit text-mode SMS
+
+class SmsOutbox:
+    """Persistent queue of alert texts waiting to go out by SMS.
+
+    Every change is written to a JSON file (tmp + fsync + atomic rename), so alerts survive a
+    restart or power loss. next_batch() hands out all due alerts that fit into one SMS; failed
+    batches are retried with exponential backoff and dropped after `max_attempts`.
+    """
+
+    def __init__(self, path, logger=None, max_attempts=10, retry_base=5, retry_max=300, max_len=SMS_MAX_LEN):
+        self.path = path
+        self.logger = logger or logging.getLogger(__name__)
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.max_len = max_len
+        self._items = []
+        self._next_id = 1
+        self._done = {}         # id -> sent?, for send_sms(wait=True); trimmed
+        self._cond = threading.Condition()
+        self._load()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+    def add(self, text):
+        with self._cond:
+            item = {"id": self._next_id, "text": text, "created": time.time(), "attempts": 0, "next_attempt": 0.0}
+            self._next_id += 1
+            self._items.append(item)
+            self._save()
+            self._cond.notify_all()
+            return item["id"]
+
+    def next_batch(self, timeout=1.0):
+        """Wait up to timeout for due alerts; returns the oldest ones that fit into one SMS."""
+        with self._cond:
+            end = time.time() + timeout
+            while True:
+                now = time.time()
+                due = [item for item in self._items if item["next_attempt"] <= now]
+                if due:
+                    break
+                waits = [item["next_attempt"] - now for item in self._items] + [end - now]
+                if end <= now:
+                    return []
+                self._cond.wait(max(0.01, min(waits)))
+
+            batch = []
+            for item in due:
+                if batch and len(compose(batch + [item], max_len=None)) > self.max_len:
+                    break
+                batch.append(item)
+            return batch
+
+    def mark_sent(self, batch):
+        with self._cond:
+            ids = {item["id"] for item in batch}
+            self._items = [item for item in self._items if item["id"] not in ids]
+            self._finish(ids, True)
+
+    def mark_failed(self, batch, error):
+        """Schedule a retry for each alert in batch; returns the ids given up on."""
+        with self._cond:
+            dropped = set()
+            now = time.time()
+            for item in batch:
+                item["attempts"] += 1
+                if item["attempts"] >= self.max_attempts:
+                    dropped.add(item["id"])
+                    self.logger.error(f"Giving up on SMS after {item['attempts']} attempts: {item['text']}")
+                else:
+                    backoff = min(self.retry_base * 2 ** (item["attempts"] - 1), self.retry_max)
+                    item["next_attempt"] = now + backoff
+            self.logger.warning(f"SMS send failed ({error}); {len(batch) - len(dropped)} alerts will be retried")
+            self._items = [item for item in self._items if item["id"] not in dropped]
+            self._finish(dropped, False)
+            return dropped
+
+    def wait_done(self, item_id, timeout=None):
+        """Block until the alert was sent (True) or given up on (False); None on timeout."""
+        with self._cond:
+            self._cond.wait_for(lambda: item_id in self._done, timeout)
+            return self._done.get(item_id)
+
+    def wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def _finish(self, ids, sent):
+        for item_id in ids:
+            self._done[item_id] = sent
+        if len(self._done) > 1000:
+            for item_id in sorted(self._done)[:len(self._done) - 1000]:
+                del self._done[item_id]
+        self._save()
+        self._cond.notify_all()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                self._items = json.load(f)
+            for item in self._items:
+                item["next_attempt"] = 0.0
+            self._next_id = max((item["id"] for item in self._items), default=0) + 1
+            OUTBOX_DEPTH.set(len(self._items))
+            if self._items:
+                self.logger.info(f"Loaded {len(self._items)} unsent SMS alerts from {self.path}")
+        except Exception as e:
+            self.logger.warning(f"Discarding unreadable SMS outbox {self.path}: {e}")
+            self._items = []
+
+    def _save(self):
+        OUTBOX_DEPTH.set(len(self._items))
+        tmp = f"{self.path}.tmp"
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(tmp, 'w') as f:
+                json.dump(self._items, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except Exception as e:
+            self.logger.error(f"Saving SMS outbox to {self.path} failed: {e}")
+
+def compose(batch, max_len=SMS_MAX_LEN):
+    """One SMS text for a batch: identical alerts are counted, distinct ones joined in order."""
+    counts = {}
+    for item in batch:
+        counts[item["text"]] = counts.get(item["text"], 0) + 1
+    text = "; ".join(msg if n == 1 else f"{msg} (x{n})" for msg, n in counts.items())
+    return text if max_len is None else text[:max_len]
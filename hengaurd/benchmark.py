@@ -0,0 +1,214 @@
+"""Replay a recorded clip through the real pipeline and report per-stage timings.
+
+    python3 benchmark.py --source caught.webm --output bench.json
+    python3 benchmark.py --source caught.webm --pace camera --baseline bench_baseline.json
+    python3 benchmark.py --source caught.webm --imgsz 320 --save-baseline bench_baseline.json
+    python3 benchmark.py --source caught.webm --worker process --baseline bench_baseline.json
+
+Exits with status 1 when --baseline is given and a metric regresses by more than --threshold.
+"""
+import argparse
+import json
+import platform
+import resource
+import sys
+import time
+import cv2
+import numpy as np
+import yaml
+from utils.logger import setup_logger
+from inference.worker import create_detector
+from inference.result_parser import parse_results
+from logic.theft_detector import TheftDetector
+from display.overlay_renderer import OverlayRenderer
+
+STAGES = ["read", "detect", "parse", "logic", "render"]
+PERCENTILES = [50, 90, 95, 99]
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux, bytes on macOS
+    return rss / (1024 * 1024) if platform.system() == "Darwin" else rss / 1024
+
+def summarize(samples):
+    arr = np.asarray(samples, dtype=np.float64)
+    if arr.size == 0:
+        return {}
+    out = {f"p{p}_ms": float(np.percentile(arr, p)) for p in PERCENTILES}
+    out["mean_ms"] = float(arr.mean())
+    out["max_ms"] = float(arr.max())
+    return out
+
+def run_benchmark(source, model_cfg, zones_cfg, logger, pace="max", fps=None, max_frames=None, warmup=5, render=True):
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise RuntimeError(f"Cannot open video source: {source}")
+    clip_fps = cap.get(cv2.CAP_PROP_FPS) or 0
+    pace_fps = fps or clip_fps or 6
+    period = 1.0 / pace_fps
+
+    detector = create_detector({**model_cfg, "zones": zones_cfg}, logger)
+    # A replay must never load or overwrite the live coop's persisted tracks
+    theft_logic = TheftDetector(zones_cfg, persist_path=None, logger=logger)
+    renderer = OverlayRenderer({'enabled': render}, logger)
+    timings = {stage: [] for stage in STAGES + ["total"]}
+    if (model_cfg.get("cascade") or {}).get("enabled"):
+        timings["person"] = []  # the part of detect spent in the cascade's person stage
+    frames = 0
+    theft_frames = 0
+    theft_events = 0
+    in_theft = False
+    start = time.perf_counter() if warmup == 0 else None
+    next_due = time.perf_counter()
+
+    while max_frames is None or frames < max_frames + warmup:
+        if pace == "camera":
+            delay = next_due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            next_due += period
+
+        t0 = time.perf_counter()
+        ret, frame = cap.read()
+        if not ret or frame is None:
+            break
+        t1 = time.perf_counter()
+        results = detector.detect(frame)
+        t2 = time.perf_counter()
+        dets = parse_results(results, logger)
+        t3 = time.perf_counter()
+        theft_logic.update_tracks(dets.ids, dets.centers)
+        suspects = theft_logic.detect_frame(dets)
+        theft = len(suspects) > 0
+        t4 = time.perf_counter()
+        if results:
+            renderer.update(dets, suspects)
+        renderer.render(frame)
+        t5 = time.perf_counter()
+
+        frames += 1
+        if frames == warmup:
+            start = time.perf_counter()
+        if frames <= warmup:
+            continue
+        for stage, (a, b) in zip(STAGES, [(t0, t1), (t1, t2), (t2, t3), (t3, t4), (t4, t5)]):
+            timings[stage].append((b - a) * 1000)
+        timings["total"].append((t5 - t0) * 1000)
+        if "person" in timings and detector.last_person_ms is not None:
+            timings["person"].append(detector.last_person_ms)
+        theft_frames += theft
+        theft_events += theft and not in_theft
+        in_theft = theft
+
+    cap.release()
+    theft_logic.close()
+    if hasattr(detector, 'close'):
+        detector.close()
+    measured = frames - warmup
+    if measured <= 0 or start is None:
+        raise RuntimeError(f"Clip too short: {frames} frames read, {warmup} used for warm-up")
+    elapsed = time.perf_counter() - start
+
+    return {
+        "source": source,
+        "pace": pace,
+        "pace_fps": pace_fps if pace == "camera" else None,
+        "model": {
+            "path": model_cfg["path"],
+            "backend": detector.backend.name if hasattr(detector, "backend") else model_cfg.get("backend", "auto"),
+            "imgsz": detector.imgsz,
+            "worker": model_cfg.get("worker", "thread"),
+        },
+        "frames": measured,
+        "fps": measured / elapsed,
+        "peak_rss_mb": peak_rss_mb(),
+        "theft_frames": int(theft_frames),
+        "theft_events": int(theft_events),
+        "stages": {stage: summarize(samples) for stage, samples in timings.items()},
+    }
+
+def compare(report, baseline, threshold):
+    """List of human-readable regressions beyond `threshold` (fractional) vs. the baseline."""
+    regressions = []
+    for stage, stats in report["stages"].items():
+        base = baseline.get("stages", {}).get(stage, {})
+        for key in ("p50_ms", "p95_ms"):
+            if key in stats and base.get(key):
+                change = stats[key] / base[key] - 1
+                if change > threshold:
+                    regressions.append(f"{stage} {key}: {base[key]:.1f} -> {stats[key]:.1f} (+{change:.0%})")
+    if baseline.get("fps"):
+        change = report["fps"] / baseline["fps"] - 1
+        if change < -threshold:
+            regressions.append(f"fps: {baseline['fps']:.2f} -> {report['fps']:.2f} ({change:.0%})")
+    if baseline.get("peak_rss_mb"):
+        change = report["peak_rss_mb"] / baseline["peak_rss_mb"] - 1
+        if change > threshold:
+            regressions.append(
+                f"peak_rss_mb: {baseline['peak_rss_mb']:.0f} -> {report['peak_rss_mb']:.0f} (+{change:.0%})"
+            )
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="HenGuard replay benchmark")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--source", default="caught.webm", help="Recorded clip to replay")
+    parser.add_argument("--pace", choices=["max", "camera"], default="max",
+                        help="max: as fast as possible; camera: at camera.fps from the config (or --fps)")
+    parser.add_argument("--fps", type=float, help="Pace for --pace camera (default: camera.fps, then the clip's fps)")
+    parser.add_argument("--frames", type=int, help="Stop after this many measured frames")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--model", help="Override model.path")
+    parser.add_argument("--backend", help="Override model.backend")
+    parser.add_argument("--imgsz", type=int, help="Override model.imgsz")
+    parser.add_argument("--worker", choices=["thread", "process"], help="Override model.worker")
+    parser.add_argument("--no-render", action="store_true", help="Skip the rendering stage")
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--baseline", help="Compare against this earlier --output/--save-baseline file")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed regression, e.g. 0.10 = 10%%")
+    parser.add_argument("--save-baseline", help="Also write the result here as the new baseline")
+    args = parser.parse_args()
+
+    logger = setup_logger()
+    with open(args.config) as f:
+        cfg = yaml.safe_load(f)
+    model_cfg = dict(cfg["model"])
+    for key, value in (("path", args.model), ("backend", args.backend), ("imgsz", args.imgsz), ("worker", args.worker)):
+        if value:
+            model_cfg[key] = value
+    fps = args.fps or cfg.get("camera", {}).get("fps")
+
+    try:
+        report = run_benchmark(args.source, model_cfg, cfg["zones"], logger, pace=args.pace, fps=fps,
+                               max_frames=args.frames, warmup=args.warmup, render=not args.no_render)
+    except Exception as e:
+        logger.error(f"Benchmark failed: {e}")
+        sys.exit(2)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+
+    print(f"{report['frames']} frames, {report['fps']:.2f} FPS end-to-end, peak RSS {report['peak_rss_mb']:.0f} MB, "
+          f"{report['theft_events']} theft events")
+    for stage, stats in report["stages"].items():
+        if stats:
+            print(f"  {stage:<7} p50 {stats['p50_ms']:7.2f}ms  p95 {stats['p95_ms']:7.2f}ms  "
+                  f"p99 {stats['p99_ms']:7.2f}ms  max {stats['max_ms']:7.2f}ms")
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"REGRESSION vs {args.baseline} (threshold {args.threshold:.0%}):")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"No regressions vs {args.baseline} (threshold {args.threshold:.0%})")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,12 @@
 import cv2
 import time
+import threading
+from utils.metrics import Counter, Gauge
+
+CAPTURE_FPS = Gauge.create("henguard_camera_capture_fps", "Smoothed rate of frames captured from the camera", ["camera"])
+CAPTURED_FRAMES = Counter.create("henguard_camera_frames_total", "Frames captured from the camera", ["camera"])
+DROPPED_FRAMES = Counter.create("henguard_camera_dropped_frames_total", "Captured frames replaced before they were read", ["camera"])
+RECONNECTS = Counter.create("henguard_camera_reconnects_total", "Successful camera reconnections", ["camera"])
 
 class CameraManager:
     def __init__(self, cfg, logger, max_failures=5, offline_alert_seconds=30, max_backoff=60):
@@ -13,52 +20,98 @@ class CameraManager:
         self.offline_alert_seconds = offline_alert_seconds
         self.max_backoff = max_backoff
         self._backoff = 1
+
+        # Threaded capture: a grabber thread drains the device and keeps only the newest frame
+        self.threaded = cfg.get('threaded', False)
+        self.frame_seq = 0          # sequence number of the newest captured frame
+        self.frame_time = None      # capture timestamp of the newest captured frame
+        self.dropped_frames = 0     # frames overwritten before anyone read them
+        self._latest = None
+        self._last_read_seq = 0
+        self._cap_lock = threading.Lock()
+        self._frame_cond = threading.Condition()
+        self._stop = threading.Event()
+        self._grabber = None
+        self._supervisor = None
+        self._supervisor_lock = threading.Lock()
+        self.reconnect_count = 0
+        self.name = str(cfg.get('name', 'default'))
+        self.capture_fps = 0.0
+        self._prev_frame_time = None
+
         self._init_camera()
+        if not self.is_alive:
+            self._start_supervisor()
+        if self.threaded:
+            self._grabber = threading.Thread(target=self._grab_loop, name="camera-grabber", daemon=True)
+            self._grabber.start()
 
     def _init_camera(self):
-        if self.cap is not None:
+        with self._cap_lock:
+            if self.cap is not None:
+                try:
+                    self.cap.release()
+                except Exception:
+                    pass
             try:
-                self.cap.release()
-            except Exception:
-                pass
-        try:
-            self.cap = cv2.VideoCapture(self.cfg['source'])
-            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.cfg['width'])
-            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.cfg['height'])
-            self.cap.set(cv2.CAP_PROP_FPS, self.cfg['fps'])
-            if not self.cap.isOpened():
-                self.logger.error("Camera init failed: Unable to open camera source.")
+                self.cap = cv2.VideoCapture(self.cfg['source'])
+                self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.cfg['width'])
+                self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.cfg['height'])
+                self.cap.set(cv2.CAP_PROP_FPS, self.cfg['fps'])
+                if self.threaded:
+                    # We drain the device ourselves; a deep driver queue only adds latency
+                    self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+                if not self.cap.isOpened():
+                    self.logger.error("Camera init failed: Unable to open camera source.")
+                    self.is_alive = False
+                    raise RuntimeError("Camera init failed")
+                # Verify actual camera properties
+                actual_w = self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)
+                actual_h = self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
+                actual_fps = self.cap.get(cv2.CAP_PROP_FPS)
+                self.logger.info(f"Camera initialized. Actual properties: width={actual_w}, height={actual_h}, fps={actual_fps}")
+                self.is_alive = True
+                self.failure_count = 0
+                self.last_alive_time = time.time()
+                self._backoff = 1
+            except Exception as e:
+                self.logger.error(f"Camera initialization error: {e}")
                 self.is_alive = False
-                raise RuntimeError("Camera init failed")
-            # Verify actual camera properties
-            actual_w = self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)
-            actual_h = self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
-            actual_fps = self.cap.get(cv2.CAP_PROP_FPS)
-            self.logger.info(f"Camera initialized. Actual properties: width={actual_w}, height={actual_h}, fps={actual_fps}")
-            self.is_alive = True
-            self.failure_count = 0
-            self.last_alive_time = time.time()
-            self._backoff = 1
-        except Exception as e:
-            self.logger.error(f"Camera initialization error: {e}")
-            self.is_alive = False
 
-    def read(self):
+    def read(self, wait=True):
+        if self.threaded:
+            return self._read_latest(wait)
+        ret, frame = self._read_device()
+        if ret:
+            self.frame_seq += 1
+            self.frame_time = self.last_alive_time
+            self._record_frame(self.frame_time)
+        return ret, frame
+
+    def read_with_meta(self):
+        """Like read(), but also returns the capture timestamp and sequence number."""
+        if self.threaded:
+            with self._frame_cond:
+                ret, frame = self._read_latest()
+                return ret, frame, self.frame_time, self.frame_seq
+        ret, frame = self.read()
+        return ret, frame, self.frame_time, self.frame_seq
+
+    def _read_device(self):
         if not self.is_alive:
-            self.logger.error(f"Camera is not alive. Read aborted. Backing off for {self._backoff} seconds.")
-            time.sleep(self._backoff)
-            self._backoff = min(self._backoff * 2, self.max_backoff)
-            self._init_camera()
+            # Reconnection happens on the supervisor thread; never stall the caller here
+            self._start_supervisor()
             return False, None
         try:
-            ret, frame = self.cap.read()
+            with self._cap_lock:
+                ret, frame = self.cap.read()
             if not ret:
                 self.failure_count += 1
                 self.logger.warning(f"Camera read failed: No frame captured. Failure count: {self.failure_count}")
                 if self.failure_count >= self.max_failures:
                     self.logger.error("Max consecutive camera failures reached. Attempting reinitialization.")
                     self.is_alive = False
-                    self._init_camera()
+                    self._start_supervisor()
                 return False, None
             self.failure_count = 0
             self.last_alive_time = time.time()
@@ -70,9 +123,69 @@ class CameraManager:
             if self.failure_count >= self.max_failures:
                 self.logger.error("Max consecutive camera failures reached. Attempting reinitialization.")
                 self.is_alive = False
-                self._init_camera()
+                self._start_supervisor()
             return False, None
 
+    def _start_supervisor(self):
+        with self._supervisor_lock:
+            if self._stop.is_set() or (self._supervisor is not None and self._supervisor.is_alive()):
+                return
+            self._supervisor = threading.Thread(target=self._supervise, name="camera-supervisor", daemon=True)
+            self._supervisor.start()
+
+    def _supervise(self):
+        while not self.is_alive:
+            self.logger.error(f"Camera is not alive. Retrying in {self._backoff} seconds.")
+            if self._stop.wait(self._backoff):
+                return
+            self._backoff = min(self._backoff * 2, self.max_backoff)
+            self._init_camera()
+        self.reconnect_count += 1
+        RECONNECTS.inc(camera=self.name)
+        self.logger.info(f"Camera reconnected (reconnect #{self.reconnect_count}).")
+
+    @property
+    def status(self):
+        return "online" if self.is_alive else "offline"
+
+    def _grab_loop(self):
+        while not self._stop.is_set():
+            if not self.is_alive:
+                self._start_supervisor()
+                self._stop.wait(0.1)
+                continue
+            ret, frame = self._read_device()
+            if not ret:
+                continue
+            with self._frame_cond:
+                if self._latest is not None and self._last_read_seq < self.frame_seq:
+                    self.dropped_frames += 1
+                    DROPPED_FRAMES.inc(camera=self.name)
+                self._latest = frame
+                self.frame_seq += 1
+                self.frame_time = self.last_alive_time
+                self._frame_cond.notify_all()
+            self._record_frame(self.frame_time)
+
+    def _record_frame(self, now):
+        CAPTURED_FRAMES.inc(camera=self.name)
+        if self._prev_frame_time is not None and now > self._prev_frame_time:
+            fps = 1.0 / (now - self._prev_frame_time)
+            self.capture_fps = fps if not self.capture_fps else 0.9 * self.capture_fps + 0.1 * fps
+            CAPTURE_FPS.set(round(self.capture_fps, 2), camera=self.name)
+        self._prev_frame_time = now
+
+    def _read_latest(self, wait=True):
+        # Never waits on the device. If the newest frame was already handed out, wait at most
+        # one frame period for the next one so callers don't spin or re-infer the same image.
+        with self._frame_cond:
+            if wait and self._last_read_seq == self.frame_seq:
+                self._frame_cond.wait(timeout=1.0 / max(self.cfg.get('fps', 30), 1))
+            if self._latest is None or self._last_read_seq == self.frame_seq:
+                return False, None
+            self._last_read_seq = self.frame_seq
+            return True, self._latest
+
     @property
     def camera_offline_too_long(self):
         if not self.is_alive and (time.time() - self.last_alive_time) > self.offline_alert_seconds:
@@ -80,10 +193,15 @@ class CameraManager:
         return False
 
     def release(self):
+        self._stop.set()
+        for t in (self._grabber, self._supervisor):
+            if t is not None:
+                t.join(timeout=2)
         try:
-            if self.cap is not None:
-                self.cap.release()
-                self.logger.info("Camera released.")
+            with self._cap_lock:
+                if self.cap is not None:
+                    self.cap.release()
+                    self.logger.info("Camera released.")
         except Exception as e:
             self.logger.error(f"Camera release exception: {e}")
-        self.is_alive = False
\ No newline at end of file
+        self.is_alive = False
@@ -0,0 +1,91 @@
+import time
+import cv2
+import numpy as np
+from inference.result_parser import HUMAN_CLS, HEN_CLS
+
+# BGR
+CLASS_STYLES = {
+    HUMAN_CLS: ("person", (255, 160, 60)),
+    HEN_CLS: ("hen", (70, 210, 100)),
+}
+SUSPECT_COLOR = (48, 48, 255)
+
+class OverlayRenderer:
+    """Draws humans, hens and suspicious tracks onto a reusable frame buffer.
+
+    Replaces Ultralytics' results.plot(), which allocates a fresh annotated copy per frame and
+    draws every class with generic styling. update() stores the latest detections whenever
+    inference ran; render() copies the frame into one of `buffers` preallocated buffers and draws
+    them, at most `draw_fps` times per second (0 = every call). Boxes are kept for `box_ttl`
+    seconds so frames the motion gate skipped still show them. With enabled: false (headless)
+    nothing is drawn and render() returns None.
+    """
+
+    def __init__(self, cfg, logger):
+        self.logger = logger
+        self.enabled = cfg.get('enabled', True)
+        self.draw_fps = cfg.get('draw_fps', 0)
+        self.box_ttl = cfg.get('box_ttl', 1.0)
+        self.labels = cfg.get('labels', True)
+        self.thickness = cfg.get('thickness', 2)
+        self.render_ms = None
+        self._buffers = [None] * max(1, cfg.get('buffers', 3))
+        self._next_buffer = 0
+        self._next_draw = 0.0
+        self._dets = None
+        self._suspects = set()
+        self._dets_time = 0.0
+
+    def update(self, dets, suspects=(), now=None):
+        if not self.enabled:
+            return
+        self._dets = dets
+        self._suspects = set(np.asarray(suspects).tolist())
+        self._dets_time = now or time.time()
+
+    def due(self, now=None):
+        return self.enabled and (now or time.time()) >= self._next_draw
+
+    def render(self, frame, now=None, fresh=False):
+        """Annotated copy of frame in a reused buffer, or None if headless or not due yet.
+
+        The returned buffer is overwritten `buffers` render() calls later; consumers that hold on
+        to it longer (e.g. other threads) pass fresh=True to get a newly allocated array they own.
+        """
+        now = now or time.time()
+        if not self.due(now):
+            return None
+        if self.draw_fps:
+            self._next_draw = now + 1.0 / self.draw_fps
+
+        start = time.perf_counter()
+        if fresh:
+            out = frame.copy()
+        else:
+            out = self._buffers[self._next_buffer]
+            if out is None or out.shape != frame.shape or out.dtype != frame.dtype:
+                out = self._buffers[self._next_buffer] = np.empty_like(frame)
+            self._next_buffer = (self._next_buffer + 1) % len(self._buffers)
+            np.copyto(out, frame)
+
+        dets = self._dets
+        if dets is not None and len(dets) and now - self._dets_time <= self.box_ttl:
+            self._draw(out, dets)
+        if self._suspects and now - self._dets_time <= self.box_ttl:
+            cv2.putText(out, "THEFT DETECTED!", (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1.2, SUSPECT_COLOR, 3)
+        self.render_ms = (time.perf_counter() - start) * 1000
+        return out
+
+    def _draw(self, out, dets):
+        for tid, cls, (x1, y1, x2, y2) in zip(dets.ids.tolist(), dets.classes.tolist(), dets.boxes.tolist()):
+            style = CLASS_STYLES.get(cls)
+            if style is None:
+                continue
+            name, color = style
+            suspect = tid in self._suspects
+            if suspect:
+                color = SUSPECT_COLOR
+            cv2.rectangle(out, (x1, y1), (x2, y2), color, self.thickness * 2 if suspect else self.thickness)
+            if self.labels:
+                cv2.putText(out, f"{name} {tid}", (x1, max(y1 - 5, 12)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1,
+                            cv2.LINE_AA)
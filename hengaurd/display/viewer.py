@@ -0,0 +1,74 @@
+import os
+import sys
+import threading
+import time
+import cv2
+
+def resolve_display_mode(cfg):
+    """'headless' or 'viewer'; mode: auto picks viewer only when a display is available."""
+    mode = cfg.get('mode', 'auto')
+    if mode == 'auto':
+        has_display = (
+            not sys.platform.startswith('linux') or os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY')
+        )
+        return 'viewer' if has_display else 'headless'
+    if mode not in ('headless', 'viewer'):
+        raise ValueError(f"Unknown display mode '{mode}'. Use 'auto', 'headless' or 'viewer'.")
+    return mode
+
+class Viewer:
+    """Shows frames on its own thread so the GUI never slows the detection loop.
+
+    show() only drops the newest frame for a window into a shared slot; the viewer thread picks up
+    changed slots at most `viewer_fps` times per second and owns all imshow/waitKey calls. If the
+    GUI fails (e.g. no display) the viewer logs it and stops, and detection carries on headless.
+    """
+
+    def __init__(self, cfg, logger):
+        self.logger = logger
+        self.max_fps = cfg.get('viewer_fps', 10)
+        self.quit_requested = threading.Event()
+        self.failed = False
+        self._slots = {}
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="viewer", daemon=True)
+        self._thread.start()
+
+    @property
+    def active(self):
+        return not self.failed and not self._stop.is_set()
+
+    def show(self, window, frame):
+        with self._lock:
+            self._slots[window] = frame
+            self._pending.add(window)
+
+    def _run(self):
+        period = 1.0 / max(self.max_fps, 1)
+        try:
+            while not self._stop.is_set():
+                start = time.time()
+                with self._lock:
+                    frames = [(window, self._slots[window]) for window in self._pending]
+                    self._pending.clear()
+                for window, frame in frames:
+                    cv2.imshow(window, frame)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    self.logger.info("Viewer closed by user.")
+                    self.quit_requested.set()
+                    break
+                self._stop.wait(max(0.0, period - (time.time() - start)))
+        except Exception as e:
+            self.failed = True
+            self.logger.error(f"Viewer failed, continuing headless: {e}")
+        finally:
+            try:
+                cv2.destroyAllWindows()
+            except Exception:
+                pass
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=2)
@@ -0,0 +1,88 @@
+import os
+import time
+from camera.camera_manager import CameraManager
+from inference.motion_gate import MotionGate
+from inference.result_parser import parse_results
+from logic.theft_detector import TheftDetector
+
+class CameraChannel:
+    def __init__(self, name, camera, theft_logic, motion_gate):
+        self.name = name
+        self.camera = camera
+        self.theft_logic = theft_logic
+        self.motion_gate = motion_gate
+
+class MultiCameraEngine:
+    """Drives N cameras through a single shared Detector.
+
+    Every camera keeps its own CameraManager, tracker (keyed by camera name inside the Detector)
+    and TheftDetector; frames that are ready on a tick are inferred together in one batch.
+    """
+
+    def __init__(self, cfg, detector, logger, scheduler=None, idle_sleep=0.005):
+        self.detector = detector
+        self.scheduler = scheduler
+        self.logger = logger
+        self.idle_sleep = idle_sleep
+        self.channels = []
+
+        defaults = {k: v for k, v in cfg.get('camera', {}).items() if k != 'source'}
+        defaults.setdefault('threaded', True)
+        for i, cam_cfg in enumerate(cfg['cameras']):
+            name = str(cam_cfg.get('name', f"cam{i}"))
+            if any(ch.name == name for ch in self.channels):
+                raise ValueError(f"Duplicate camera name: {name}")
+            camera = CameraManager({**defaults, **cam_cfg, 'name': name}, logger)
+            motion_gate = MotionGate({**cfg.get('motion', {}), **cam_cfg.get('motion', {})}, logger)
+            theft_logic = TheftDetector(cfg['zones'], persist_path=self._persist_path(cfg['zones'], name), logger=logger,
+                                        name=name)
+            self.channels.append(CameraChannel(name, camera, theft_logic, motion_gate))
+        self.logger.info(f"Multi-camera engine started with {len(self.channels)} cameras: "
+                         f"{', '.join(ch.name for ch in self.channels)}")
+
+    @staticmethod
+    def _persist_path(zones_cfg, name):
+        # One track file per camera: track IDs are only unique within a camera
+        path = zones_cfg.get('persist_path')
+        if not path:
+            return None
+        root, ext = os.path.splitext(path)
+        return f"{root}_{name}{ext}"
+
+    def offline_too_long(self):
+        return [ch.name for ch in self.channels if ch.camera.camera_offline_too_long]
+
+    def step(self):
+        """Gather the newest frame of every camera and run them as one batch.
+
+        Returns a list of (channel, frame, results, dets, suspects) for the cameras that had a new
+        frame; suspects are the track IDs that triggered theft.
+        """
+        ready, active = [], []
+        skip = self.scheduler is not None and self.scheduler.should_skip()
+        for ch in self.channels:
+            ret, frame = ch.camera.read(wait=False)
+            if ret:
+                ready.append((ch, frame))
+                if not skip and ch.motion_gate.should_infer(frame):
+                    active.append((ch, frame))
+        if not ready:
+            time.sleep(self.idle_sleep)
+            return []
+
+        # Only cameras with motion (or due a keep-alive) go into the batch
+        batch = self.detector.detect_batch([frame for _, frame in active], [ch.name for ch, _ in active])
+        by_name = {ch.name: results for (ch, _), results in zip(active, batch)}
+
+        out = []
+        for ch, frame in ready:
+            results = by_name.get(ch.name, [])
+            dets = parse_results(results, self.logger)
+            ch.theft_logic.update_tracks(dets.ids, dets.centers)
+            out.append((ch, frame, results, dets, ch.theft_logic.detect_frame(dets)))
+        return out
+
+    def release(self):
+        for ch in self.channels:
+            ch.camera.release()
+            ch.theft_logic.close()
@@ -0,0 +1,215 @@
+import threading
+import time
+from collections import deque
+from inference.result_parser import Detections, parse_results
+from utils.metrics import Counter, Histogram
+
+STAGE_SECONDS = Histogram.create("henguard_pipeline_stage_seconds", "Processing time per pipeline stage", ["stage"])
+QUEUE_DROPPED = Counter.create("henguard_pipeline_dropped_total", "Packets dropped by full pipeline queues", ["queue"])
+
+END = object()  # end-of-stream marker passed down the queues
+
+class FramePacket:
+    """One frame and everything the stages learned about it."""
+
+    __slots__ = ('seq', 'time', 'frame', 'results', 'dets', 'suspects', 'inferred', 'offline')
+
+    def __init__(self, seq, frame, offline=False, captured=None):
+        self.seq = seq
+        self.time = time.time() if captured is None else captured  # capture time, used for track velocities
+        self.frame = frame
+        self.results = []
+        self.dets = Detections.empty()
+        self.suspects = Detections.empty().ids
+        self.inferred = False
+        self.offline = offline
+
+class DropOldestQueue:
+    """Bounded queue whose put() never blocks: when full, the oldest packet is dropped.
+
+    With block=True (lossless file replay) put() waits for room instead, until close().
+    """
+
+    def __init__(self, name, maxsize=2, block=False):
+        self.name = name
+        self.maxsize = maxsize
+        self.block = block
+        self.dropped = 0
+        self._closed = False
+        self._items = deque()
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        with self._cond:
+            if self.block:
+                self._cond.wait_for(lambda: len(self._items) < self.maxsize or self._closed)
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+                QUEUE_DROPPED.inc(queue=self.name)
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items, timeout):
+                return None
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        """Release blocked put() calls; from then on a full queue drops again."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+class Pipeline:
+    """Capture -> inference -> logic -> sinks, each stage on its own thread.
+
+    Stages are joined by DropOldestQueues, so a slow stage sheds the oldest frames instead of
+    stalling the ones before it: capture always hands inference the newest frame, and every
+    threaded sink (GUI, MJPEG, recorder) has its own queue so one slow viewer can't hold up the
+    others. Sinks marked `inline` (alerts) run on the logic thread and see every packet. Tracking
+    and theft logic each run on a single thread, so they still see frames in order, and track
+    velocities use each frame's capture time rather than when the logic stage got to it.
+
+    lossless=True makes every queue block instead of dropping, so each frame reaches every stage;
+    use it with an unpaced FileSource to replay a clip frame by frame as fast as inference allows.
+    """
+
+    def __init__(self, source, detector, theft_logic, logger, motion_gate=None, scheduler=None, sinks=(),
+                 keyframes=None, queue_size=2, logic_queue_size=8, lossless=False):
+        self.source = source
+        self.detector = detector
+        self.theft_logic = theft_logic
+        self.logger = logger
+        self.motion_gate = motion_gate
+        self.scheduler = scheduler
+        self.keyframes = keyframes if keyframes is not None and keyframes.enabled else None
+        self.sinks = list(sinks)
+        self._stop = threading.Event()
+        self._infer_q = DropOldestQueue("inference", queue_size, block=lossless)
+        # Dropping here would lose detections the tracker history needs, so give logic more slack
+        self._logic_q = DropOldestQueue("logic", logic_queue_size, block=lossless)
+        self._sink_qs = [(sink, DropOldestQueue(f"sink:{sink.name}", queue_size, block=lossless))
+                         for sink in self.sinks if not sink.inline]
+        self._threads = []
+        self._stopped = False
+
+    def start(self):
+        self._spawn("capture", self._capture_loop)
+        self._spawn("inference", self._stage_loop, "inference", self._infer_q, self._infer, [self._logic_q])
+        self._spawn("logic", self._stage_loop, "logic", self._logic_q, self._logic, [q for _, q in self._sink_qs])
+        for sink, q in self._sink_qs:
+            self._spawn(f"sink-{sink.name}", self._stage_loop, sink.name, q, self._sink_handler(sink), [])
+        sinks = ', '.join(sink.name for sink in self.sinks) or 'no sinks'
+        self.logger.info(f"Pipeline started: {self.source.name} -> {sinks}")
+
+    def run(self):
+        """Start, then block until the source ends, a sink asks to quit (e.g. 'q' in the GUI) or stop()."""
+        self.start()
+        try:
+            while not self._stop.is_set():
+                if not any(t.is_alive() for t in self._threads):
+                    break
+                if any(sink.done for sink in self.sinks):
+                    self.logger.info("Pipeline stop requested by a sink.")
+                    break
+                time.sleep(0.1)
+        finally:
+            self.stop()
+
+    def stop(self, timeout=2):
+        if self._stopped:
+            return
+        self._stopped = True
+        self._stop.set()
+        for q in [self._infer_q, self._logic_q] + [q for _, q in self._sink_qs]:
+            q.close()
+        for t in self._threads:
+            t.join(timeout=timeout)
+        try:
+            self.source.release()
+        except Exception as e:
+            self.logger.error(f"Releasing {self.source.name} failed: {e}")
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception as e:
+                self.logger.error(f"Closing sink {sink.name} failed: {e}")
+
+    def _spawn(self, name, target, *args):
+        t = threading.Thread(target=target, args=args, name=f"pipeline-{name}", daemon=True)
+        t.start()
+        self._threads.append(t)
+
+    # ---------------- stages ----------------
+    def _capture_loop(self):
+        seq = 0
+        while not self._stop.is_set():
+            if self.source.offline_too_long:
+                self._infer_q.put(FramePacket(seq, None, offline=True))
+            ret, frame = self.source.read()
+            if not ret:
+                if self.source.finished:
+                    self.logger.info(f"Source {self.source.name} finished.")
+                    self._infer_q.put(END)
+                    return
+                if self.source.status == "offline":
+                    # Reconnection runs in the background; keep polling so the offline alert fires on time
+                    time.sleep(0.1)
+                continue
+            seq += 1
+            self._infer_q.put(FramePacket(seq, frame, captured=self.source.frame_time))
+
+    def _stage_loop(self, name, inq, handler, outputs):
+        while not self._stop.is_set():
+            packet = inq.get(timeout=0.5)
+            if packet is None:
+                continue
+            if packet is END:
+                for q in outputs:
+                    q.put(END)
+                return
+            start = time.perf_counter()
+            try:
+                handler(packet)
+            except Exception as e:
+                self.logger.error(f"Pipeline stage {name} failed: {e}")
+                continue
+            STAGE_SECONDS.observe(time.perf_counter() - start, stage=name)
+            for q in outputs:
+                q.put(packet)
+
+    def _infer(self, packet):
+        if packet.frame is None:
+            return
+        skip = self.scheduler is not None and self.scheduler.should_skip()
+        if skip or (self.motion_gate is not None and not self.motion_gate.should_infer(packet.frame)):
+            return
+        if self.keyframes is not None:
+            motion_started = self.motion_gate is not None and self.motion_gate.motion_started
+            packet.results = self.keyframes.detect(packet.frame, motion_started=motion_started, now=packet.time)
+        else:
+            packet.results = self.detector.detect(packet.frame)
+        packet.inferred = bool(packet.results)
+        packet.dets = parse_results(packet.results, self.logger)
+
+    def _logic(self, packet):
+        if packet.frame is not None:
+            self.theft_logic.update_tracks(packet.dets.ids, packet.dets.centers, now=packet.time)
+            packet.suspects = self.theft_logic.detect_frame(packet.dets)
+        for sink in self.sinks:
+            if sink.inline:
+                try:
+                    sink.handle(packet)
+                except Exception as e:
+                    self.logger.error(f"Sink {sink.name} failed: {e}")
+
+    @staticmethod
+    def _sink_handler(sink):
+        def handle(packet):
+            if packet.frame is not None:
+                sink.handle(packet)
+        return handle
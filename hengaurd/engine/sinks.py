@@ -0,0 +1,130 @@
+from abc import ABC, abstractmethod
+import cv2
+from streaming.events import frame_metadata
+
+class Sink(ABC):
+    """Consumer at the end of a Pipeline.
+
+    Threaded sinks (the default) get their own drop-oldest queue and thread; inline sinks run on
+    the logic thread, see every packet (including camera-offline packets without a frame) and must
+    not block.
+    """
+
+    name = "sink"
+    inline = False
+
+    @property
+    def done(self):
+        """True when the sink wants the whole pipeline to stop."""
+        return False
+
+    @abstractmethod
+    def handle(self, packet):
+        """Consume one FramePacket."""
+
+    def close(self):
+        pass
+
+class AlertSink(Sink):
+    """Turns theft / camera-offline packets into alert messages for `notify` (e.g. AlertManager.trigger)."""
+
+    name = "alerts"
+    inline = True
+
+    def __init__(self, notify, label=None):
+        self.notify = notify
+        self.suffix = f" [{label}]" if label else ""
+
+    def handle(self, packet):
+        if packet.offline:
+            self.notify(f"CAMERA OFFLINE TOO LONG{self.suffix}")
+        elif len(packet.suspects) > 0:
+            self.notify(f"HEN THEFT DETECTED{self.suffix}")
+
+class RenderingSink(Sink):
+    def __init__(self, renderer):
+        self.renderer = renderer
+
+    def _update(self, packet):
+        if packet.inferred:
+            self.renderer.update(packet.dets, packet.suspects)
+
+class GuiSink(RenderingSink):
+    """Shows annotated frames through a display.viewer.Viewer; 'q' in the window stops the pipeline."""
+
+    name = "gui"
+
+    def __init__(self, viewer, renderer, window="THEFT DETECTION"):
+        super().__init__(renderer)
+        self.viewer = viewer
+        self.window = window
+
+    @property
+    def done(self):
+        return self.viewer.quit_requested.is_set()
+
+    def handle(self, packet):
+        self._update(packet)
+        if not self.viewer.active:
+            return  # no display (or the viewer failed): don't copy and draw frames nobody sees
+        view = self.renderer.render(packet.frame)
+        if view is not None:
+            self.viewer.show(self.window, view)
+
+class MjpegSink(RenderingSink):
+    """Publishes frames to a FrameBroadcaster and, optionally, per-frame metadata to an EventBroadcaster."""
+
+    name = "mjpeg"
+
+    def __init__(self, broadcaster, renderer, detector, events=None):
+        super().__init__(renderer)
+        self.broadcaster = broadcaster
+        self.detector = detector
+        self.events = events
+        overlaid = [p.name for p in broadcaster.profiles.values() if p.overlay]
+        if overlaid and not renderer.enabled:
+            renderer.logger.warning(
+                f"display.enabled is false: stream profiles {', '.join(overlaid)} need overlays and will "
+                "serve no frames (use overlay: false profiles and /viewer instead)"
+            )
+
+    def handle(self, packet):
+        self._update(packet)
+        # Only draw server-side while someone watches an annotated profile. The broadcaster's encoder
+        # threads keep reading the drawing after this returns, so it gets its own array.
+        annotated = self.renderer.render(packet.frame, fresh=True) if self.broadcaster.wants_overlay else None
+        seq = self.broadcaster.publish(packet.frame, annotated)
+        if self.events is not None:
+            self.events.publish(seq, frame_metadata(
+                seq, packet.frame, packet.dets, packet.suspects, self.detector.names, inferred=packet.inferred
+            ))
+
+class RecorderSink(RenderingSink):
+    """Writes annotated frames to a video file (opened on the first frame, so the size always matches)."""
+
+    name = "recorder"
+
+    def __init__(self, path, fps, renderer, logger, codec="mp4v"):
+        super().__init__(renderer)
+        self.path = path
+        self.fps = fps
+        self.logger = logger
+        self.codec = codec
+        self.writer = None
+
+    def handle(self, packet):
+        self._update(packet)
+        view = self.renderer.render(packet.frame)
+        frame = packet.frame if view is None else view
+        if self.writer is None:
+            h, w = frame.shape[:2]
+            self.writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*self.codec), self.fps, (w, h))
+            if not self.writer.isOpened():
+                raise RuntimeError(f"Cannot open video writer for {self.path}")
+            self.logger.info(f"Recording to {self.path}")
+        self.writer.write(frame)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.release()
+            self.logger.info(f"Recording saved to {self.path}")
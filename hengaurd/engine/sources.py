@@ -0,0 +1,98 @@
+import time
+import cv2
+from camera.camera_manager import CameraManager
+
+NETWORK_SCHEMES = ('rtsp://', 'rtmp://', 'http://', 'https://')
+
+class CameraSource:
+    """Local camera or network stream read through CameraManager (threaded capture, reconnects)."""
+
+    finished = False
+
+    def __init__(self, cfg, logger, name=None):
+        self.name = name or str(cfg.get('name', cfg['source']))
+        self.camera = CameraManager(cfg, logger)
+        self.frame_time = None  # capture time of the last frame read
+
+    @property
+    def status(self):
+        return self.camera.status
+
+    @property
+    def offline_too_long(self):
+        return self.camera.camera_offline_too_long
+
+    def read(self):
+        ret, frame, self.frame_time, _ = self.camera.read_with_meta()
+        return ret, frame
+
+    def release(self):
+        self.camera.release()
+
+class FileSource:
+    """Recorded clip. With pace, frames come at the clip's own frame rate, like a live camera.
+
+    frame_time follows the clip's own timestamps, so velocities are right even when the clip is
+    replayed faster or slower than real time.
+    """
+
+    status = "online"
+    offline_too_long = False
+
+    def __init__(self, path, logger, pace=True, loop=False):
+        self.name = str(path)
+        self.logger = logger
+        self.pace = pace
+        self.loop = loop
+        self.finished = False
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise RuntimeError(f"Cannot open video source: {path}")
+        self.period = 1.0 / (self.cap.get(cv2.CAP_PROP_FPS) or 25)
+        self._next_due = None
+        self._start = time.time()
+        self.frame_time = None
+
+    def read(self):
+        if self.pace:
+            now = time.time()
+            if self._next_due is None or now - self._next_due > self.period:
+                self._next_due = now  # first frame, or fell behind: don't burst to catch up
+            elif self._next_due > now:
+                time.sleep(self._next_due - now)
+            self._next_due += self.period
+        ret, frame = self.cap.read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            if self.frame_time is not None:
+                self._start = self.frame_time + self.period  # keep time moving forward across loops
+            ret, frame = self.cap.read()
+        if not ret or frame is None:
+            self.finished = True
+            return False, None
+        self.frame_time = self._start + self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+        return True, frame
+
+    def release(self):
+        self.cap.release()
+
+def create_source(cfg, logger):
+    """Source for a camera config entry; type: auto picks camera, rtsp or file from `source`."""
+    kind = cfg.get('type', 'auto')
+    source = cfg['source']
+    if kind == 'auto':
+        if isinstance(source, int) or str(source).isdigit():
+            kind = 'camera'
+        elif str(source).startswith(NETWORK_SCHEMES):
+            kind = 'rtsp'
+        else:
+            kind = 'file'
+
+    if kind == 'camera':
+        return CameraSource(cfg, logger)
+    if kind == 'rtsp':
+        # Network streams buffer on the server side; drain them continuously and keep the newest frame
+        return CameraSource({**cfg, 'threaded': cfg.get('threaded', True)}, logger)
+    if kind == 'file':
+        return FileSource(source, logger, pace=cfg.get('pace', True), loop=cfg.get('loop', False))
+    raise ValueError(f"Unknown source type '{kind}'. Use 'auto', 'camera', 'rtsp' or 'file'.")
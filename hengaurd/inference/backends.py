@@ -0,0 +1,195 @@
+import ast
+import glob
+from abc import ABC, abstractmethod
+import os
+import cv2
+import numpy as np
+import yaml
+
+# Fallback class names for exported models that carry no metadata (our custom two-class model)
+DEFAULT_NAMES = {0: 'person', 1: 'hen'}
+
+def resolve_backend_name(cfg):
+    backend = cfg.get('backend', 'auto')
+    if backend != 'auto':
+        return backend
+    path = cfg['path']
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.pt':
+        return 'pytorch'
+    if ext == '.onnx':
+        return 'onnxruntime'
+    if ext == '.xml' or (os.path.isdir(path) and glob.glob(os.path.join(path, '*.xml'))):
+        return 'openvino'
+    raise ValueError(f"Cannot infer inference backend for model path '{path}'. Set model.backend explicitly.")
+
+def create_backend(cfg, logger):
+    name = resolve_backend_name(cfg)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}'. Choose one of: {', '.join(BACKENDS)}")
+    logger.info(f"Using inference backend '{name}' for model {cfg['path']}")
+    return BACKENDS[name](cfg, logger)
+
+def letterbox(img, new_shape, color=114):
+    h, w = img.shape[:2]
+    r = min(new_shape[0] / h, new_shape[1] / w)
+    nh, nw = int(round(h * r)), int(round(w * r))
+    top, left = (new_shape[0] - nh) // 2, (new_shape[1] - nw) // 2
+    out = np.full((new_shape[0], new_shape[1], 3), color, dtype=np.uint8)
+    out[top:top + nh, left:left + nw] = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    return out, r, (left, top)
+
+class InferenceBackend(ABC):
+    """Runs a detection model and returns raw detections.
+
+    predict() returns one float32 array per frame with rows [x1, y1, x2, y2, conf, cls] in the
+    frame's pixel coordinates. Backends that can track natively (PyTorch) set native_tracking.
+    """
+
+    name = "base"
+    native_tracking = False
+
+    def __init__(self, cfg, logger):
+        self.cfg = cfg
+        self.logger = logger
+        self.path = cfg['path']
+        self.names = dict(cfg.get('names') or DEFAULT_NAMES)
+
+    @abstractmethod
+    def predict(self, frames, conf, imgsz):
+        """One (N, 6) float32 array per frame."""
+
+class PyTorchBackend(InferenceBackend):
+    name = "pytorch"
+    native_tracking = True
+
+    def __init__(self, cfg, logger):
+        super().__init__(cfg, logger)
+        from ultralytics import YOLO
+
+        self.model = YOLO(self.path)
+        self.names = self.model.names
+
+    def predict(self, frames, conf, imgsz):
+        results = self.model.predict(frames, conf=conf, imgsz=imgsz, verbose=False)
+        return [r.boxes.data.cpu().numpy().astype(np.float32) for r in results]
+
+class ExportedModelBackend(InferenceBackend):
+    """Shared letterbox pre-processing and YOLOv8 head decoding + NMS for exported models."""
+
+    iou = 0.7
+    max_det = 300
+
+    def __init__(self, cfg, logger):
+        super().__init__(cfg, logger)
+        self.iou = cfg.get('iou', self.iou)
+        self.threads = cfg.get('threads')
+        self.input_hw = None  # fixed input size baked into the model, if any
+        self.batch_size = 1   # fixed batch size baked into the model, None when dynamic
+
+    def predict(self, frames, conf, imgsz):
+        hw = self.input_hw or (imgsz, imgsz)
+        prepared = [letterbox(frame, hw) for frame in frames]
+        blobs = [cv2.dnn.blobFromImage(img, 1 / 255.0, swapRB=True) for img, _, _ in prepared]
+
+        if self.batch_size is None:
+            outputs = list(self._run(np.concatenate(blobs)))
+        else:
+            outputs = [self._run(blob)[0] for blob in blobs]
+
+        return [
+            self._postprocess(out, conf, ratio, pad, frame.shape[:2])
+            for out, (_, ratio, pad), frame in zip(outputs, prepared, frames)
+        ]
+
+    @abstractmethod
+    def _run(self, blob):
+        """Raw model output for a (B, 3, H, W) blob."""
+
+    def _postprocess(self, pred, conf, ratio, pad, frame_hw):
+        # YOLOv8 head: (4 + num_classes, num_anchors) with boxes as cx, cy, w, h
+        pred = pred.T
+        scores = pred[:, 4:]
+        cls = scores.argmax(axis=1)
+        confs = scores[np.arange(len(scores)), cls]
+        keep = confs >= conf
+        if not keep.any():
+            return np.empty((0, 6), dtype=np.float32)
+        boxes, confs, cls = pred[keep, :4], confs[keep], cls[keep]
+
+        # Class-aware NMS: offset each class into its own coordinate range
+        xywh = boxes.copy()
+        xywh[:, :2] -= xywh[:, 2:] / 2
+        offset = (cls * 4096.0)[:, None]
+        nms_boxes = np.hstack([xywh[:, :2] + offset, xywh[:, 2:]])
+        idx = cv2.dnn.NMSBoxes(nms_boxes.tolist(), confs.tolist(), conf, self.iou)
+        idx = np.asarray(idx, dtype=int).reshape(-1)[:self.max_det]
+
+        xyxy = np.hstack([xywh[idx, :2], xywh[idx, :2] + xywh[idx, 2:]])
+        xyxy -= np.array([pad[0], pad[1], pad[0], pad[1]], dtype=xyxy.dtype)
+        xyxy /= ratio
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, frame_hw[1])
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, frame_hw[0])
+        return np.hstack([xyxy, confs[idx, None], cls[idx, None]]).astype(np.float32)
+
+class OnnxRuntimeBackend(ExportedModelBackend):
+    name = "onnxruntime"
+
+    def __init__(self, cfg, logger):
+        super().__init__(cfg, logger)
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.threads:
+            opts.intra_op_num_threads = int(self.threads)
+        self.session = ort.InferenceSession(self.path, sess_options=opts, providers=["CPUExecutionProvider"])
+        inp = self.session.get_inputs()[0]
+        self.input_name = inp.name
+        self.input_dtype = np.float16 if 'float16' in inp.type else np.float32
+        shape = inp.shape
+        self.batch_size = shape[0] if isinstance(shape[0], int) else None
+        if isinstance(shape[2], int) and isinstance(shape[3], int):
+            self.input_hw = (shape[2], shape[3])
+
+        names = self.session.get_modelmeta().custom_metadata_map.get('names')
+        if names:
+            self.names = ast.literal_eval(names)
+
+    def _run(self, blob):
+        return self.session.run(None, {self.input_name: blob.astype(self.input_dtype, copy=False)})[0]
+
+class OpenVinoBackend(ExportedModelBackend):
+    name = "openvino"
+
+    def __init__(self, cfg, logger):
+        super().__init__(cfg, logger)
+        import openvino as ov
+
+        xml = self.path
+        if os.path.isdir(xml):
+            xml = sorted(glob.glob(os.path.join(xml, '*.xml')))[0]
+            meta = os.path.join(self.path, 'metadata.yaml')
+            if os.path.exists(meta):
+                with open(meta) as f:
+                    self.names = (yaml.safe_load(f) or {}).get('names', self.names)
+
+        core = ov.Core()
+        config = {"PERFORMANCE_HINT": "LATENCY"}
+        if self.threads:
+            config["INFERENCE_NUM_THREADS"] = int(self.threads)
+        self.compiled = core.compile_model(core.read_model(xml), "CPU", config)
+        self.output = self.compiled.output(0)
+        shape = self.compiled.input(0).get_partial_shape()
+        self.batch_size = shape[0].get_length() if shape[0].is_static else None
+        if shape[2].is_static and shape[3].is_static:
+            self.input_hw = (shape[2].get_length(), shape[3].get_length())
+
+    def _run(self, blob):
+        return self.compiled([blob])[self.output]
+
+BACKENDS = {
+    "pytorch": PyTorchBackend,
+    "onnxruntime": OnnxRuntimeBackend,
+    "openvino": OpenVinoBackend,
+}
@@ -0,0 +1,46 @@
+import numpy as np
+
+def box_iou(a, b):
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy arrays -> (N, M)."""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(br - tl, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+def match_detections(ref, test, iou_thr=0.5):
+    """Greedy same-class matching of test detections against reference ones.
+
+    Both are [x1, y1, x2, y2, conf, cls] arrays. Returns (matched, ious) where matched is the
+    number of reference boxes that found a partner and ious holds the IoU of each match.
+    """
+    if len(ref) == 0 or len(test) == 0:
+        return 0, []
+    iou = box_iou(ref[:, :4], test[:, :4])
+    iou[ref[:, 5][:, None] != test[:, 5][None, :]] = 0
+    ious = []
+    while True:
+        i, j = np.unravel_index(np.argmax(iou), iou.shape)
+        if iou[i, j] < iou_thr:
+            break
+        ious.append(float(iou[i, j]))
+        iou[i, :] = 0
+        iou[:, j] = 0
+    return len(ious), ious
+
+def nms(dets, iou_thr=0.5):
+    """Class-aware non-maximum suppression over [x1, y1, x2, y2, conf, cls] rows, best first."""
+    dets = np.asarray(dets, dtype=np.float32).reshape(-1, 6)
+    dets = dets[np.argsort(-dets[:, 4], kind='stable')]
+    iou = box_iou(dets[:, :4], dets[:, :4])
+    iou[dets[:, 5][:, None] != dets[:, 5][None, :]] = 0
+    keep = np.ones(len(dets), dtype=bool)
+    for i in range(len(dets)):
+        if keep[i]:
+            suppress = iou[i] > iou_thr
+            suppress[:i + 1] = False
+            keep &= ~suppress
+    return dets[keep]
@@ -0,0 +1,120 @@
+import time
+import numpy as np
+from inference.backends import create_backend
+from inference.box_ops import nms
+from inference.result_parser import HEN_CLS, HUMAN_CLS
+from utils.metrics import Counter, Histogram
+
+CASCADE_FRAMES = Counter.create(
+    "henguard_cascade_frames_total", "Frames seen by the person-first cascade, by whether the hen stage ran",
+    ["hen_stage"]
+)
+PERSON_STAGE_SECONDS = Histogram.create(
+    "henguard_cascade_person_stage_seconds", "Person-stage inference time per frame (part of the inference latency)"
+)
+
+def merge_rois(boxes):
+    """Union overlapping [x1, y1, x2, y2] boxes until none overlap."""
+    rois = [list(b) for b in boxes]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(rois)):
+            for j in range(i + 1, len(rois)):
+                a, b = rois[i], rois[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    rois[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    del rois[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return rois
+
+class PersonCascade:
+    """Person-first detection: a cheap person model on every frame, the full model only near people.
+
+    Theft needs a human, so the person stage (a small model and/or a low imgsz) runs on every
+    frame, and the full human-and-hen model only runs on crops around the people it finds,
+    expanded by `margin` px (default 1.25 x zones.pixel_threshold, so every hen close enough to
+    count is inside a crop). Humans come from the person stage and hens from the full model,
+    merged into the usual [x1, y1, x2, y2, conf, cls] rows. Frames without people cost one small
+    forward pass; last_person_ms / henguard_cascade_person_stage_seconds show what that pass costs.
+
+    Under the adaptive scheduler, imgsz steps scale the person stage's imgsz by the same ratio
+    (scale_imgsz) and frame skipping covers both stages; fallback models only replace the full model.
+    """
+
+    def __init__(self, cfg, zones_cfg, logger):
+        self.logger = logger
+        self.enabled = cfg.get('enabled', False)
+        self.conf = cfg.get('conf', 0.4)
+        self.imgsz = self.base_imgsz = cfg.get('imgsz', 160)
+        self.margin = cfg.get('margin', 1.25 * zones_cfg.get('pixel_threshold', 120))
+        self.merge_iou = cfg.get('merge_iou', 0.5)
+        self.backend = None
+        self.person_class = None
+        self.last_person_ms = None
+        if not self.enabled:
+            return
+
+        path = cfg.get('path', 'yolov8n.pt')
+        self.backend = create_backend(
+            {'path': path, 'backend': cfg.get('backend', 'auto'), 'threads': cfg.get('threads')}, logger
+        )
+        names = {int(k): v for k, v in self.backend.names.items()}
+        self.person_class = cfg.get(
+            'person_class', next((k for k, v in names.items() if v == 'person'), HUMAN_CLS)
+        )
+        self.logger.info(
+            f"Person-first cascade enabled: {path} at imgsz {self.imgsz} on every frame, "
+            f"full model within {self.margin:.0f}px of people"
+        )
+
+    def predict(self, frames, full_predict):
+        """Detections for each frame; `full_predict(crops)` runs the full model on a list of crops."""
+        start = time.time()
+        persons = [self._persons(dets) for dets in self.backend.predict(frames, self.conf, self.imgsz)]
+        self.last_person_ms = (time.time() - start) * 1000 / len(frames)
+        PERSON_STAGE_SECONDS.observe(self.last_person_ms / 1000)
+
+        crops, owners = [], []
+        for i, (frame, people) in enumerate(zip(frames, persons)):
+            if not len(people):
+                CASCADE_FRAMES.inc(hen_stage="skipped")
+                continue
+            CASCADE_FRAMES.inc(hen_stage="run")
+            h, w = frame.shape[:2]
+            boxes = people[:, :4] + np.array([-self.margin, -self.margin, self.margin, self.margin])
+            boxes = np.clip(np.round(boxes), 0, [w, h, w, h]).astype(int)
+            for x1, y1, x2, y2 in merge_rois(boxes):
+                if x2 > x1 and y2 > y1:
+                    crops.append((x1, y1, frame[y1:y2, x1:x2]))
+                    owners.append(i)
+
+        hens = [[] for _ in frames]
+        if crops:
+            for (x1, y1, _), owner, dets in zip(crops, owners, full_predict([crop for _, _, crop in crops])):
+                dets = np.asarray(dets, dtype=np.float32).reshape(-1, 6)
+                dets = dets[dets[:, 5] == HEN_CLS].copy()
+                dets[:, [0, 2]] += x1
+                dets[:, [1, 3]] += y1
+                hens[owner].append(dets)
+
+        out = []
+        for people, frame_hens in zip(persons, hens):
+            frame_hens = np.concatenate(frame_hens) if frame_hens else np.empty((0, 6), dtype=np.float32)
+            if len(frame_hens) > 1:
+                frame_hens = nms(frame_hens, self.merge_iou)  # ROIs don't overlap, but boxes can straddle two
+            out.append(np.concatenate([people, frame_hens]))
+        return out
+
+    def scale_imgsz(self, ratio):
+        # Never above the configured size; multiples of 32, the model stride
+        self.imgsz = max(32, round(self.base_imgsz * min(ratio, 1.0) / 32) * 32)
+
+    def _persons(self, dets):
+        dets = np.asarray(dets, dtype=np.float32).reshape(-1, 6)
+        people = dets[dets[:, 5] == self.person_class].copy()
+        people[:, 5] = HUMAN_CLS
+        return people
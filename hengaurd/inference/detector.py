@@ -1,6 +1,14 @@
-from ultralytics import YOLO
-import os
+from ultralytics.engine.results import Results
 import time
+import numpy as np
+from inference.backends import create_backend
+from inference.cascade import PersonCascade
+from inference.regions import RegionTiler
+from inference.tracker import StreamTracker
+from utils.metrics import Counter, Histogram
+
+INFERENCE_SECONDS = Histogram.create("henguard_inference_latency_seconds", "Model inference time per frame")
+DETECTIONS = Counter.create("henguard_detections_total", "Objects detected, by class", ["class"])
 
 class Detector:
 
@@ -10,15 +18,14 @@ class Detector:
         self.max_failures = max_failures
         self.inference_warn_ms = inference_warn_ms
         self.failure_count = 0
-
-        model_path = cfg['path']
-        ext = os.path.splitext(model_path)[1].lower()
-        if ext != '.pt':
-            self.logger.error(
-                f"Model format {ext} not supported. Use .pt weights with Ultralytics YOLO(). "
-                "ONNX is not supported directly. Convert ONNX to .pt using Ultralytics export tools."
-            )
-            raise ValueError("Unsupported model format for Ultralytics YOLO. Use .pt weights.")
+        self.tracker_cfg = cfg.get('tracker', 'bytetrack.yaml')
+        self._trackers = {}
+        self.cfg = cfg
+        self.model_path = cfg['path']
+        self.last_inference_ms = None
+        self.latency_callback = None
+        # zones.regions: only these parts of the frame are inferred (tiled), see RegionTiler
+        self.tiler = RegionTiler(cfg.get('zones') or {}, logger)
 
         if cfg['imgsz'] > 416:
             self.logger.warning(
@@ -27,11 +34,14 @@ class Detector:
             )
 
         try:
-            self.model = YOLO(model_path)
+            self.backend = create_backend(cfg, logger)
+            self.cascade = PersonCascade(cfg.get('cascade') or {}, cfg.get('zones') or {}, logger)
+            self.model = getattr(self.backend, 'model', None)
+            self.names = self.backend.names
             self.conf = cfg['conf']
-            self.imgsz = cfg['imgsz']
+            self.imgsz = self.base_imgsz = cfg['imgsz']
             self.logger.info(
-                "Model loaded. For Pi, use yolov8n.pt and imgsz <= 320 for best speed. "
+                "Model loaded. For Pi, prefer an exported ONNX/OpenVINO yolov8n and imgsz <= 320 for best speed. "
                 "Monitor memory if using persist=True."
             )
         except Exception as e:
@@ -47,14 +57,19 @@ class Detector:
 
         start = time.time()
         try:
-            results = self.model.track(
-                frame,
-                persist=True,
-                conf=self.conf,
-                imgsz=self.imgsz,
-                verbose=False
-            )
+            if self.backend.native_tracking and not self.tiler.enabled and not self.cascade.enabled:
+                results = self.model.track(
+                    frame,
+                    persist=True,
+                    conf=self.conf,
+                    imgsz=self.imgsz,
+                    verbose=False
+                )
+            else:
+                dets = self._predict([frame])[0]
+                results = [self._track("default", dets, frame)]
             elapsed_ms = (time.time() - start) * 1000
+            self._record_latency(elapsed_ms)
             if elapsed_ms > self.inference_warn_ms:
                 self.logger.warning(
                     f"Detection inference time {elapsed_ms:.1f}ms exceeds {self.inference_warn_ms}ms. "
@@ -72,6 +87,7 @@ class Detector:
                 self._maybe_alert_failure()
                 return []
             self.failure_count = 0
+            self._count_detections(results)
             return results
         except Exception as e:
             self.logger.error(f"Detection failed: {e}")
@@ -79,6 +95,137 @@ class Detector:
             self._maybe_alert_failure()
             return []
 
+    def predict(self, frame):
+        """Raw [x1, y1, x2, y2, conf, cls] rows without any tracking step, or None on failure.
+
+        Used on keyframes in detect-every-N mode, where the built-in IoUTracker assigns the IDs.
+        """
+        if frame is None:
+            self.logger.warning("Detector received None frame. Skipping detection.")
+            self.failure_count += 1
+            self._maybe_alert_failure()
+            return None
+
+        start = time.time()
+        try:
+            dets = self._predict([frame])[0]
+            self._record_latency((time.time() - start) * 1000)
+            self.failure_count = 0
+            self._count_classes(dets[:, 5])
+            return dets
+        except Exception as e:
+            self.logger.error(f"Detection failed: {e}")
+            self.failure_count += 1
+            self._maybe_alert_failure()
+            return None
+
+    def detect_batch(self, frames, streams):
+        """Run one batched forward pass over frames from several cameras.
+
+        `streams` names the source of each frame; every stream keeps its own tracker, so track
+        IDs never leak between cameras. Returns one results list per frame ([] on failure).
+        """
+        if not frames:
+            return []
+
+        start = time.time()
+        try:
+            dets = self._predict(frames)
+            elapsed_ms = (time.time() - start) * 1000
+            self._record_latency(elapsed_ms / len(frames))
+            if elapsed_ms > self.inference_warn_ms * len(frames):
+                self.logger.warning(
+                    f"Batched inference time {elapsed_ms:.1f}ms for {len(frames)} frames exceeds "
+                    f"{self.inference_warn_ms}ms per frame. Consider reducing imgsz or using a smaller model."
+                )
+            if len(dets) != len(frames):
+                self.logger.warning("Batched detection returned mismatched results. Skipping batch.")
+                self.failure_count += 1
+                self._maybe_alert_failure()
+                return [[] for _ in frames]
+
+            batch = [[self._track(stream, d, frame)] for stream, d, frame in zip(streams, dets, frames)]
+            self.failure_count = 0
+            for results in batch:
+                self._count_detections(results)
+            return batch
+        except Exception as e:
+            self.logger.error(f"Batched detection failed: {e}")
+            self.failure_count += 1
+            self._maybe_alert_failure()
+            return [[] for _ in frames]
+
+    def _predict(self, frames):
+        if self.cascade.enabled:
+            # Regions don't apply here: people are searched in the whole frame, hens only around them
+            return self.cascade.predict(frames, lambda crops: self.backend.predict(crops, self.conf, self.imgsz))
+        if not self.tiler.enabled:
+            return self.backend.predict(frames, self.conf, self.imgsz)
+        # Tiles of every frame go through the backend as one batch
+        hw = getattr(self.backend, 'input_hw', None)
+        tile = max(hw) if hw else self.imgsz  # static-shape exports ignore imgsz
+        crops = [self.tiler.crops(frame, tile) for frame in frames]
+        tile_dets = self.backend.predict([crop for tiles in crops for _, _, crop in tiles], self.conf, self.imgsz)
+        out, i = [], 0
+        for frame, tiles in zip(frames, crops):
+            out.append(self.tiler.merge(frame.shape, tiles, tile_dets[i:i + len(tiles)]))
+            i += len(tiles)
+        return out
+
+    @property
+    def imgsz_adjustable(self):
+        # Exported models with a static input shape ignore imgsz
+        return getattr(self.backend, 'input_hw', None) is None
+
+    @property
+    def last_person_ms(self):
+        return self.cascade.last_person_ms if self.cascade.enabled else None
+
+    def set_imgsz(self, imgsz):
+        self.imgsz = int(imgsz)
+        if self.cascade.enabled:
+            # Scheduler steps shrink the person stage too, or it alone could keep blowing the budget
+            self.cascade.scale_imgsz(self.imgsz / self.base_imgsz)
+
+    def switch_model(self, path):
+        try:
+            backend = create_backend({**self.cfg, 'path': path, 'backend': 'auto'}, self.logger)
+        except Exception as e:
+            self.logger.error(f"Switching model to {path} failed: {e}")
+            return False
+        self.backend = backend
+        self.model = getattr(backend, 'model', None)
+        self.names = backend.names
+        self.model_path = path
+        self._trackers = {}
+        self.logger.info(f"Switched detection model to {path}")
+        return True
+
+    def _record_latency(self, elapsed_ms):
+        self.last_inference_ms = elapsed_ms
+        INFERENCE_SECONDS.observe(elapsed_ms / 1000)
+        if self.latency_callback:
+            self.latency_callback(elapsed_ms)
+
+    def _count_detections(self, results):
+        cls = results[0].boxes.cls
+        if hasattr(cls, 'cpu'):
+            cls = cls.cpu().numpy()
+        self._count_classes(cls)
+
+    def _count_classes(self, cls):
+        for c, n in zip(*np.unique(np.asarray(cls, dtype=np.int64), return_counts=True)):
+            DETECTIONS.inc(int(n), **{'class': self.names.get(int(c), str(c))})
+
+    def _track(self, stream, dets, frame):
+        # Tracking step on raw backend output; wraps the tracks in an Ultralytics Results so the
+        # rest of the pipeline (box parsing, plot()) is backend-agnostic.
+        tracker = self._trackers.get(stream)
+        if tracker is None:
+            tracker = self._trackers[stream] = StreamTracker(self.tracker_cfg)
+        tracks = tracker.update(dets, frame)
+        return Results(frame, path=stream, names=self.names, boxes=tracks)
+
     def _maybe_alert_failure(self):
         if self.failure_count >= self.max_failures:
             msg = (
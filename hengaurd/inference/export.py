@@ -0,0 +1,60 @@
+"""Convert the configured .pt model for the ONNX Runtime or OpenVINO backend.
+
+Usage (from the project root):
+    python3 -m inference.export --format onnx
+    python3 -m inference.export --format openvino --imgsz 256
+"""
+import argparse
+import sys
+import yaml
+from utils.logger import setup_logger
+
+FORMATS = {
+    "onnx": "onnxruntime",
+    "openvino": "openvino",
+}
+
+def export_model(weights, fmt, imgsz, half=False, dynamic=False):
+    from ultralytics import YOLO
+
+    kwargs = {"format": fmt, "imgsz": imgsz, "half": half, "dynamic": dynamic}
+    if fmt == "onnx":
+        kwargs["simplify"] = True
+    return YOLO(weights).export(**kwargs)
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the HenGuard model for a faster inference backend.")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--weights", help="Source .pt weights (default: model.path from the config)")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="onnx")
+    parser.add_argument("--imgsz", type=int, help="Input size baked into the export (default: model.imgsz)")
+    parser.add_argument("--half", action="store_true", help="FP16 weights (OpenVINO only benefits on supported CPUs)")
+    parser.add_argument("--dynamic", action="store_true",
+                        help="Dynamic batch/shape; needed for batched multi-camera inference")
+    args = parser.parse_args()
+
+    logger = setup_logger()
+    with open(args.config) as f:
+        model_cfg = yaml.safe_load(f)['model']
+
+    weights = args.weights or model_cfg['path']
+    imgsz = args.imgsz or model_cfg.get('imgsz', 416)
+    if not weights.endswith('.pt'):
+        logger.error(f"Export needs .pt weights, got '{weights}'")
+        sys.exit(1)
+
+    try:
+        out = export_model(weights, args.format, imgsz, half=args.half, dynamic=args.dynamic)
+    except Exception as e:
+        logger.error(f"Export failed: {e}")
+        sys.exit(1)
+
+    logger.info(f"Exported {weights} -> {out}")
+    print("Update config.yaml to use it:")
+    print("model:")
+    print(f'  path: "{out}"')
+    print(f"  backend: {FORMATS[args.format]}")
+    print(f"  imgsz: {imgsz}")
+
+if __name__ == "__main__":
+    main()
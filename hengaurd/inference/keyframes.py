@@ -0,0 +1,74 @@
+import time
+from inference.result_parser import Detections
+from inference.tracker import IoUTracker
+from utils.metrics import Counter
+
+KEYFRAME_FRAMES = Counter.create(
+    "henguard_keyframe_frames_total", "Frames handled in detect-every-N mode, by source (detector, tracker)",
+    ["source"]
+)
+
+class KeyframeDetector:
+    """Detect-every-N: the model runs on keyframes and the built-in IoUTracker fills in between.
+
+    A keyframe is due every `every` frames, after `max_interval` seconds, when motion starts after
+    a still spell, or while the tracker is uncertain (a new track not yet seen `confirm_hits`
+    times, a track below `uncertain_conf`, or one a keyframe has just missed). Other frames get the
+    tracker's constant-velocity prediction, so TheftDetector keeps getting IDs and centers at
+    capture rate. Keyframes use Detector.predict(), so Ultralytics' tracker doesn't run either.
+    """
+
+    def __init__(self, cfg, detector, logger):
+        self.detector = detector
+        self.logger = logger
+        self.enabled = cfg.get('enabled', False)
+        self.every = max(1, int(cfg.get('every', 3)))
+        self.max_interval = cfg.get('max_interval', 1.0)
+        self.confirm_hits = cfg.get('confirm_hits', 2)
+        self.uncertain_conf = cfg.get('uncertain_conf', 0.0)
+        self.tracker = IoUTracker(
+            iou_threshold=cfg.get('iou_threshold', 0.3),
+            max_age=cfg.get('max_age', 1.0),
+            smoothing=cfg.get('velocity_smoothing', 0.5),
+        )
+        self.keyframes = 0
+        self.predicted = 0
+        self._since_keyframe = None
+        self._last_keyframe = 0.0
+
+        if self.enabled:
+            self.logger.info(
+                f"Detect-every-N enabled (every={self.every}, max_interval={self.max_interval}s); "
+                "IoU tracker between keyframes"
+            )
+
+    def keyframe_due(self, now, motion_started=False):
+        return (
+            self._since_keyframe is None or
+            self._since_keyframe + 1 >= self.every or
+            now - self._last_keyframe >= self.max_interval or
+            motion_started or
+            self.tracker.uncertain(self.confirm_hits, self.uncertain_conf)
+        )
+
+    def detect(self, frame, motion_started=False, now=None):
+        """Results for one frame, as [Detections] like ProcessDetector, so parse_results passes them through."""
+        now = time.time() if now is None else now
+        if self.keyframe_due(now, motion_started):
+            dets = self.detector.predict(frame)
+            if dets is not None:
+                tracks = self.tracker.update(dets, now)
+                self.keyframes += 1
+                self._since_keyframe = 0
+                self._last_keyframe = now
+                KEYFRAME_FRAMES.inc(source="detector")
+                return [Detections.from_rows(tracks)]
+            if not len(self.tracker):
+                return []
+            # Failed keyframe: coast on the tracker and try again next frame
+
+        tracks = self.tracker.predict(now)
+        self.predicted += 1
+        self._since_keyframe = (self._since_keyframe or 0) + 1
+        KEYFRAME_FRAMES.inc(source="tracker")
+        return [Detections.from_rows(tracks)]
@@ -0,0 +1,107 @@
+import time
+import cv2
+import numpy as np
+from inference.regions import region_points
+
+class MotionGate:
+    """Cheap pre-stage that decides whether a frame is worth running YOLO on.
+
+    Frames are downscaled to `width` pixels wide, converted to grayscale and compared against a
+    running-average background (method: diff) or a MOG2 model (method: mog2). Inference runs while
+    the changed-pixel ratio inside the mask exceeds `threshold`, for `hold` seconds afterwards, and
+    at least every `keepalive_interval` seconds so tracks don't expire on static scenes.
+    """
+
+    def __init__(self, cfg, logger):
+        self.logger = logger
+        self.enabled = cfg.get('enabled', False)
+        self.method = cfg.get('method', 'diff')
+        self.width = cfg.get('width', 160)
+        self.pixel_threshold = cfg.get('pixel_threshold', 25)
+        self.threshold = cfg.get('threshold', 0.005)
+        self.learning_rate = cfg.get('learning_rate', 0.05)
+        self.hold = cfg.get('hold', 2.0)
+        self.keepalive_interval = cfg.get('keepalive_interval', 5.0)
+        self.regions = cfg.get('mask') or []
+
+        if self.method not in ('diff', 'mog2'):
+            raise ValueError(f"Unknown motion method '{self.method}'. Use 'diff' or 'mog2'.")
+
+        self.motion_ratio = 0.0
+        self.moving = False
+        self.motion_started = False  # this frame's motion follows a still one
+        self.skipped = 0
+        self._size = None
+        self._mask = None
+        self._mask_pixels = 0
+        self._background = None
+        self._subtractor = None
+        self._last_motion = 0.0
+        self._last_infer = 0.0
+
+        if self.enabled:
+            self.logger.info(
+                f"Motion gate enabled (method={self.method}, threshold={self.threshold}, "
+                f"keepalive={self.keepalive_interval}s)"
+            )
+
+    def _setup(self, frame):
+        h, w = frame.shape[:2]
+        scale = min(1.0, self.width / w)
+        self._size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        sw, sh = self._size
+
+        if self.regions:
+            # Regions are [x1, y1, x2, y2] rectangles or [[x, y], ...] polygons, normalized to 0..1
+            mask = np.zeros((sh, sw), dtype=np.uint8)
+            for region in self.regions:
+                cv2.fillPoly(mask, [region_points(region, sw, sh)], 255)
+            self._mask = mask
+            self._mask_pixels = max(int(np.count_nonzero(mask)), 1)
+        else:
+            self._mask = None
+            self._mask_pixels = sw * sh
+
+        if self.method == 'mog2':
+            self._subtractor = cv2.createBackgroundSubtractorMOG2(history=200, detectShadows=False)
+
+    def _motion_ratio(self, frame):
+        small = cv2.resize(frame, self._size, interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+        if self.method == 'mog2':
+            moving = self._subtractor.apply(gray, learningRate=self.learning_rate)
+        else:
+            if self._background is None:
+                self._background = gray.astype(np.float32)
+                return 1.0
+            diff = cv2.absdiff(gray, cv2.convertScaleAbs(self._background))
+            cv2.accumulateWeighted(gray, self._background, self.learning_rate)
+            _, moving = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+
+        if self._mask is not None:
+            moving = cv2.bitwise_and(moving, self._mask)
+        return cv2.countNonZero(moving) / self._mask_pixels
+
+    def should_infer(self, frame, now=None):
+        if not self.enabled:
+            return True
+        now = time.time() if now is None else now
+        if self._size is None:
+            self._setup(frame)
+
+        self.motion_ratio = self._motion_ratio(frame)
+        moving = self.motion_ratio >= self.threshold
+        self.motion_started = moving and not self.moving
+        self.moving = moving
+        if moving:
+            self._last_motion = now
+
+        if (
+            now - self._last_motion <= self.hold or
+            now - self._last_infer >= self.keepalive_interval
+        ):
+            self._last_infer = now
+            return True
+        self.skipped += 1
+        return False
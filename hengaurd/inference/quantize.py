@@ -0,0 +1,219 @@
+"""Build an INT8 model calibrated on recorded footage and compare it against FP32.
+
+Usage (from the project root):
+    python3 -m inference.quantize --clips caught.webm --format onnx
+    python3 -m inference.quantize --clips caught.webm other.mp4 --format openvino --calib-frames 300
+
+The FP32 model is taken from --fp32 or exported from model.path. The INT8 result can be used
+directly as model.path; the ONNX Runtime / OpenVINO backends load it like any other export.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+import cv2
+import numpy as np
+import yaml
+from inference.backends import create_backend, letterbox
+from inference.box_ops import match_detections
+from inference.export import export_model
+from utils.logger import setup_logger
+
+def sample_frames(clips, num_frames, logger=None):
+    """Evenly sample up to num_frames frames across all clips."""
+    per_clip = max(1, num_frames // max(len(clips), 1))
+    frames = []
+    for clip in clips:
+        cap = cv2.VideoCapture(clip)
+        if not cap.isOpened():
+            if logger:
+                logger.error(f"Cannot open calibration clip: {clip}")
+            continue
+        # Container frame counts are unreliable (webm often reports 0), so count with grab()
+        # which skips decoding, then retrieve only the selected frames on a second pass
+        total = 0
+        while cap.grab():
+            total += 1
+        cap.release()
+        if total == 0:
+            continue
+        wanted = set(np.linspace(0, total - 1, min(per_clip, total)).astype(int).tolist())
+        cap = cv2.VideoCapture(clip)
+        for i in range(total):
+            if not cap.grab():
+                break
+            if i in wanted:
+                ret, frame = cap.retrieve()
+                if ret:
+                    frames.append(frame)
+        cap.release()
+        if logger:
+            logger.info(f"Sampled {len(wanted)} frames from {clip} ({total} total)")
+    return frames
+
+def to_blob(frame, imgsz):
+    img, _, _ = letterbox(frame, (imgsz, imgsz))
+    return cv2.dnn.blobFromImage(img, 1 / 255.0, swapRB=True)
+
+def quantize_onnx(fp32_path, int8_path, blobs):
+    import onnx
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self, input_name):
+            self.input_name = input_name
+            self._it = iter(blobs)
+
+        def get_next(self):
+            blob = next(self._it, None)
+            return None if blob is None else {self.input_name: blob}
+
+    prepared = os.path.splitext(int8_path)[0] + "_prep.onnx"
+    quant_pre_process(fp32_path, prepared)
+    fp32 = onnx.load(fp32_path)
+    try:
+        quantize_static(
+            prepared,
+            int8_path,
+            FrameReader(fp32.graph.input[0].name),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+        )
+    finally:
+        os.remove(prepared)
+
+    # Keep the Ultralytics metadata (class names, imgsz) so the backend can read it
+    int8 = onnx.load(int8_path)
+    del int8.metadata_props[:]
+    int8.metadata_props.extend(fp32.metadata_props)
+    onnx.save(int8, int8_path)
+    return int8_path
+
+def quantize_openvino(fp32_dir, int8_dir, blobs):
+    import glob
+    import nncf
+    import openvino as ov
+
+    xml = sorted(glob.glob(os.path.join(fp32_dir, '*.xml')))[0]
+    model = ov.Core().read_model(xml)
+    quantized = nncf.quantize(model, nncf.Dataset(blobs), preset=nncf.QuantizationPreset.MIXED)
+    os.makedirs(int8_dir, exist_ok=True)
+    ov.save_model(quantized, os.path.join(int8_dir, os.path.basename(xml)))
+    meta = os.path.join(fp32_dir, 'metadata.yaml')
+    if os.path.exists(meta):
+        shutil.copy(meta, int8_dir)
+    return int8_dir
+
+def _latency_stats(samples):
+    arr = np.asarray(samples, dtype=np.float64)
+    return {
+        "mean_ms": float(arr.mean()),
+        "p50_ms": float(np.percentile(arr, 50)),
+        "p95_ms": float(np.percentile(arr, 95)),
+    }
+
+def compare_models(fp32_cfg, int8_cfg, frames, conf, imgsz, logger):
+    """Run both models on the same frames; FP32 detections are the reference."""
+    report = {}
+    runs = {}
+    for label, cfg in (("fp32", fp32_cfg), ("int8", int8_cfg)):
+        backend = create_backend(cfg, logger)
+        backend.predict(frames[:1], conf, imgsz)  # warm-up
+        dets, times = [], []
+        for frame in frames:
+            start = time.perf_counter()
+            dets.append(backend.predict([frame], conf, imgsz)[0])
+            times.append((time.perf_counter() - start) * 1000)
+        runs[label] = dets
+        report[label] = {"path": cfg['path'], **_latency_stats(times)}
+
+    ref_total = sum(len(d) for d in runs["fp32"])
+    test_total = sum(len(d) for d in runs["int8"])
+    matched, ious = 0, []
+    for ref, test in zip(runs["fp32"], runs["int8"]):
+        m, frame_ious = match_detections(ref, test)
+        matched += m
+        ious.extend(frame_ious)
+
+    recall = matched / ref_total if ref_total else 1.0
+    precision = matched / test_total if test_total else 1.0
+    report["accuracy_delta"] = {
+        "fp32_detections": ref_total,
+        "int8_detections": test_total,
+        "recall_vs_fp32": recall,
+        "precision_vs_fp32": precision,
+        "f1_vs_fp32": 2 * precision * recall / max(precision + recall, 1e-9),
+        "mean_iou": float(np.mean(ious)) if ious else 0.0,
+    }
+    report["latency_delta"] = {
+        "mean_speedup": report["fp32"]["mean_ms"] / max(report["int8"]["mean_ms"], 1e-9),
+        "p95_speedup": report["fp32"]["p95_ms"] / max(report["int8"]["p95_ms"], 1e-9),
+    }
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize the HenGuard model to INT8 using recorded footage.")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--clips", nargs="+", required=True, help="Recorded clips used for calibration and evaluation")
+    parser.add_argument("--format", choices=["onnx", "openvino"], default="onnx")
+    parser.add_argument("--fp32", help="Existing FP32 export (default: export model.path)")
+    parser.add_argument("--output", help="INT8 output path (default: next to the FP32 model)")
+    parser.add_argument("--calib-frames", type=int, default=200)
+    parser.add_argument("--eval-frames", type=int, default=300)
+    parser.add_argument("--report", default="quantization_report.json")
+    args = parser.parse_args()
+
+    logger = setup_logger()
+    with open(args.config) as f:
+        model_cfg = yaml.safe_load(f)['model']
+    imgsz = model_cfg.get('imgsz', 416)
+    conf = model_cfg.get('conf', 0.4)
+
+    fp32 = args.fp32 or export_model(model_cfg['path'], args.format, imgsz)
+    backend = "onnxruntime" if args.format == "onnx" else "openvino"
+    if args.output:
+        int8 = args.output
+    elif args.format == "onnx":
+        int8 = os.path.splitext(fp32)[0] + "_int8.onnx"
+    else:
+        int8 = fp32.rstrip("/\\") + "_int8"
+
+    calib = sample_frames(args.clips, args.calib_frames, logger)
+    if not calib:
+        logger.error("No calibration frames could be read from the given clips")
+        sys.exit(1)
+    blobs = [to_blob(frame, imgsz) for frame in calib]
+
+    logger.info(f"Quantizing {fp32} -> {int8} with {len(blobs)} calibration frames")
+    try:
+        if args.format == "onnx":
+            quantize_onnx(fp32, int8, blobs)
+        else:
+            quantize_openvino(fp32, int8, blobs)
+    except Exception as e:
+        logger.error(f"Quantization failed: {e}")
+        sys.exit(1)
+
+    eval_frames = sample_frames(args.clips, args.eval_frames, logger)
+    base_cfg = {**model_cfg, "backend": backend}
+    report = compare_models({**base_cfg, "path": fp32}, {**base_cfg, "path": int8}, eval_frames, conf, imgsz, logger)
+    report["calibration_frames"] = len(blobs)
+    report["evaluation_frames"] = len(eval_frames)
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+
+    acc, lat = report["accuracy_delta"], report["latency_delta"]
+    print(f"FP32 {report['fp32']['mean_ms']:.1f}ms (p95 {report['fp32']['p95_ms']:.1f}ms) | "
+          f"INT8 {report['int8']['mean_ms']:.1f}ms (p95 {report['int8']['p95_ms']:.1f}ms) | "
+          f"speedup x{lat['mean_speedup']:.2f}")
+    print(f"INT8 vs FP32: recall {acc['recall_vs_fp32']:.3f}, precision {acc['precision_vs_fp32']:.3f}, "
+          f"mean IoU {acc['mean_iou']:.3f}")
+    print(f"Report written to {args.report}. To deploy set model.path: \"{int8}\" and model.backend: {backend}")
+
+if __name__ == "__main__":
+    main()
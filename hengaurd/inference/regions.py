@@ -0,0 +1,104 @@
+import math
+import cv2
+import numpy as np
+from inference.box_ops import nms
+
+def region_points(region, width, height):
+    """Pixel polygon for a normalized [x1, y1, x2, y2] rectangle or [[x, y], ...] polygon."""
+    pts = np.asarray(region, dtype=np.float32)
+    if pts.ndim == 1:
+        x1, y1, x2, y2 = pts
+        pts = np.array([[x1, y1], [x2, y1], [x2, y2], [x1, y2]], dtype=np.float32)
+    return np.round(pts * [width - 1, height - 1]).astype(np.int32)
+
+def _spans(start, length, tile, overlap):
+    # Evenly spaced windows of `tile` pixels covering [start, start + length); a region only
+    # slightly larger than a tile isn't worth a second, almost identical tile
+    if length <= tile * (1 + overlap / 2):
+        return [(start, start + length)]
+    stride = tile * (1 - overlap)
+    n = math.ceil((length - tile) / stride) + 1
+    step = (length - tile) / (n - 1)
+    return [(start + round(i * step), start + round(i * step) + tile) for i in range(n)]
+
+class RegionTiler:
+    """Runs inference on zones.regions instead of the whole frame.
+
+    Each region's bounding box is cut into tiles of about `tile` pixels that overlap by
+    `tile_overlap`, so a large zone is inferred in pieces and small, distant hens stay a usable
+    size. `tile` defaults to the model's input size, so tiles reach the model without being
+    scaled down; when the adaptive scheduler steps imgsz down, tiles shrink with it (more tiles
+    per region, same pixel density) rather than being downscaled. All tiles of a frame go through the backend as one batch; boxes are shifted back
+    to frame coordinates, kept when their center lies inside a region, and duplicates from
+    overlapping tiles are merged with class-aware NMS.
+    """
+
+    def __init__(self, cfg, logger):
+        self.logger = logger
+        self.regions = cfg.get('regions') or []
+        self.tile = cfg.get('tile')  # None: the imgsz passed to crops()
+        self.overlap = cfg.get('tile_overlap', 0.2)
+        self.merge_iou = cfg.get('merge_iou', 0.5)
+        self._masks = {}  # frame (h, w) -> region mask; cameras may differ in resolution
+        self._tiles = {}  # (h, w, tile) -> tiles
+
+        if not 0 <= self.overlap < 1:
+            raise ValueError(f"zones.tile_overlap must be in [0, 1), got {self.overlap}")
+
+    @property
+    def enabled(self):
+        return bool(self.regions)
+
+    def _mask(self, shape):
+        h, w = shape[:2]
+        mask = self._masks.get((h, w))
+        if mask is None:
+            mask = self._masks[(h, w)] = np.zeros((h, w), dtype=np.uint8)
+            for region in self.regions:
+                cv2.fillPoly(mask, [region_points(region, w, h)], 255)
+        return mask
+
+    def _layout(self, shape, tile):
+        h, w = shape[:2]
+        tiles = self._tiles.get((h, w, tile))
+        if tiles is not None:
+            return tiles
+        tiles = []
+        for region in self.regions:
+            pts = region_points(region, w, h)
+            x1, y1 = np.clip(pts.min(axis=0), 0, [w - 1, h - 1])
+            x2, y2 = np.clip(pts.max(axis=0) + 1, 1, [w, h])
+            for ty1, ty2 in _spans(int(y1), int(y2 - y1), tile, self.overlap):
+                for tx1, tx2 in _spans(int(x1), int(x2 - x1), tile, self.overlap):
+                    tiles.append((tx1, ty1, tx2, ty2))
+        covered = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in tiles)
+        self.logger.info(
+            f"Inference on {len(self.regions)} regions in {len(tiles)} tiles of {tile}px "
+            f"({covered / (w * h):.0%} of the {w}x{h} frame, tile overlap included)"
+        )
+        self._tiles[(h, w, tile)] = tiles
+        return tiles
+
+    def crops(self, frame, imgsz):
+        """[(x1, y1, crop), ...] for one frame inferred at imgsz; crops are views, not copies."""
+        tiles = self._layout(frame.shape, int(self.tile or imgsz))
+        return [(x1, y1, frame[y1:y2, x1:x2]) for x1, y1, x2, y2 in tiles]
+
+    def merge(self, shape, crops, tile_dets):
+        """Per-tile [x1, y1, x2, y2, conf, cls] rows of a frame of `shape` -> one array in frame coordinates."""
+        mask = self._mask(shape)
+        shifted = []
+        for (x1, y1, _), dets in zip(crops, tile_dets):
+            dets = np.asarray(dets, dtype=np.float32).reshape(-1, 6).copy()
+            dets[:, [0, 2]] += x1
+            dets[:, [1, 3]] += y1
+            shifted.append(dets)
+        dets = np.concatenate(shifted) if shifted else np.empty((0, 6), dtype=np.float32)
+        if len(dets):
+            h, w = shape[:2]
+            cx = ((dets[:, 0] + dets[:, 2]) / 2).astype(np.int64).clip(0, w - 1)
+            cy = ((dets[:, 1] + dets[:, 3]) / 2).astype(np.int64).clip(0, h - 1)
+            dets = dets[mask[cy, cx] > 0]
+        if len(crops) > 1:
+            dets = nms(dets, self.merge_iou)
+        return dets
@@ -0,0 +1,69 @@
+import numpy as np
+
+HUMAN_CLS = 0
+HEN_CLS = 1
+
+class Detections:
+    """Columnar view of one frame's tracked detections.
+
+    ids (N,) int64, classes (N,) int64, boxes (N, 4) int32 xyxy, centers (N, 2) int32,
+    confs (N,) float32.
+    """
+
+    __slots__ = ('ids', 'classes', 'boxes', 'centers', 'confs')
+
+    def __init__(self, ids, classes, boxes, centers, confs):
+        self.ids = ids
+        self.classes = classes
+        self.boxes = boxes
+        self.centers = centers
+        self.confs = confs
+
+    @classmethod
+    def empty(cls):
+        return cls(
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=np.int64),
+            np.empty((0, 4), dtype=np.int32),
+            np.empty((0, 2), dtype=np.int32),
+            np.empty(0, dtype=np.float32),
+        )
+
+    @classmethod
+    def from_rows(cls, rows):
+        """From tracker rows [x1, y1, x2, y2, id, conf, cls]."""
+        rows = np.asarray(rows).reshape(-1, 7)
+        xyxy = rows[:, :4].astype(np.int32)
+        return cls(
+            ids=rows[:, 4].astype(np.int64),
+            classes=rows[:, 6].astype(np.int64),
+            boxes=xyxy,
+            centers=(xyxy[:, :2] + xyxy[:, 2:]) // 2,
+            confs=rows[:, 5].astype(np.float32),
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+def parse_results(results, logger=None):
+    """Convert Ultralytics results for one frame into Detections in a single pass.
+
+    Only tracked boxes (those with an id) are kept, matching what TheftDetector can use.
+    Detections that are already parsed (e.g. from the inference worker process) pass through.
+    """
+    if not results:
+        return Detections.empty()
+    if isinstance(results[0], Detections):
+        return results[0]
+    try:
+        boxes = getattr(results[0], 'boxes', None)
+        if boxes is None or boxes.id is None:
+            return Detections.empty()
+        data = boxes.data
+        if hasattr(data, 'cpu'):
+            data = data.cpu().numpy()
+        return Detections.from_rows(data)  # x1, y1, x2, y2, id, conf, cls
+    except Exception as e:
+        if logger:
+            logger.warning(f"Error processing detection results: {e}")
+        return Detections.empty()
@@ -0,0 +1,145 @@
+import time
+from collections import deque
+import numpy as np
+from utils.metrics import Counter, Gauge
+
+SCHED_IMGSZ = Gauge.create("henguard_scheduler_imgsz", "Inference image size chosen by the adaptive scheduler")
+SCHED_SKIP = Gauge.create("henguard_scheduler_skip", "Frames skipped between inferences by the adaptive scheduler")
+SCHED_MODEL = Gauge.create(
+    "henguard_scheduler_model_index", "Model in use by the adaptive scheduler (0 = primary, n = nth fallback)"
+)
+SCHED_P90 = Gauge.create("henguard_scheduler_latency_p90_ms", "p90 inference latency of the last full window")
+SCHED_DECISIONS = Counter.create("henguard_scheduler_decisions_total", "Adaptive scheduler steps", ["action"])
+
+class AdaptiveScheduler:
+    """Closed-loop control of inference cost from measured Detector latency.
+
+    Every inference reports its latency. Once a full window of samples is collected, the p90
+    latency is compared against the budget:
+      - over budget: step imgsz down, then switch to the next smaller model, then skip more frames
+      - under budget * headroom: undo those steps in reverse order (skip, model, imgsz)
+    Degrading waits `cooldown` seconds between steps; recovering waits `recover_cooldown` so the
+    scheduler doesn't flap between two settings. Every step is logged and kept in `history`;
+    state() is served as /scheduler and the current setting as henguard_scheduler_* metrics.
+    """
+
+    def __init__(self, cfg, detector, logger):
+        self.detector = detector
+        self.logger = logger
+        self.enabled = cfg.get('enabled', False)
+        self.budget_ms = cfg.get('budget_ms', detector.inference_warn_ms)
+        self.headroom = cfg.get('headroom', 0.6)
+        self.cooldown = cfg.get('cooldown', 10)
+        self.recover_cooldown = cfg.get('recover_cooldown', 60)
+        self.imgsz_step = cfg.get('imgsz_step', 32)
+        self.imgsz_min = cfg.get('imgsz_min', 160)
+        self.imgsz_max = cfg.get('imgsz_max', detector.imgsz)
+        self.max_skip = cfg.get('max_skip', 3)
+        self.models = [detector.model_path] + list(cfg.get('fallback_models', []))
+
+        self.model_index = 0
+        self.skip = 0
+        self.latency_p90 = None
+        self.history = deque(maxlen=cfg.get('history', 50))
+        self._samples = deque(maxlen=cfg.get('window', 15))
+        self._skip_counter = 0
+        self._last_change = time.time()
+
+        if self.enabled:
+            detector.latency_callback = self.record
+            self._publish()
+            self.logger.info(
+                f"Adaptive scheduler enabled (budget={self.budget_ms}ms, imgsz {self.imgsz_min}-{self.imgsz_max}, "
+                f"max_skip={self.max_skip}, models={self.models})"
+            )
+
+    def should_skip(self):
+        """True for frames that should not be inferred; runs one frame out of every skip + 1."""
+        if not self.enabled or self.skip == 0:
+            return False
+        self._skip_counter += 1
+        if self._skip_counter > self.skip:
+            self._skip_counter = 0
+            return False
+        return True
+
+    def record(self, elapsed_ms):
+        self._samples.append(elapsed_ms)
+        if len(self._samples) < self._samples.maxlen:
+            return
+        self.latency_p90 = float(np.percentile(self._samples, 90))
+        SCHED_P90.set(self.latency_p90)
+        since_change = time.time() - self._last_change
+        if self.latency_p90 > self.budget_ms and since_change >= self.cooldown:
+            self._degrade()
+        elif self.latency_p90 < self.budget_ms * self.headroom and since_change >= self.recover_cooldown:
+            self._recover()
+
+    def _degrade(self):
+        imgsz = self.detector.imgsz
+        if self.detector.imgsz_adjustable and imgsz - self.imgsz_step >= self.imgsz_min:
+            self.detector.set_imgsz(imgsz - self.imgsz_step)
+            self._decided('imgsz', imgsz, self.detector.imgsz, 'over budget')
+        elif self.model_index + 1 < len(self.models):
+            self._switch_model(self.model_index + 1, 'over budget')
+        elif self.skip < self.max_skip:
+            self.skip += 1
+            self._decided('skip', self.skip - 1, self.skip, 'over budget')
+
+    def _recover(self):
+        imgsz = self.detector.imgsz
+        if self.skip > 0:
+            self.skip -= 1
+            self._decided('skip', self.skip + 1, self.skip, 'headroom')
+        elif self.model_index > 0:
+            self._switch_model(self.model_index - 1, 'headroom')
+        elif self.detector.imgsz_adjustable and imgsz + self.imgsz_step <= self.imgsz_max:
+            self.detector.set_imgsz(imgsz + self.imgsz_step)
+            self._decided('imgsz', imgsz, self.detector.imgsz, 'headroom')
+
+    def _switch_model(self, index, reason):
+        old = self.models[self.model_index]
+        if not self.detector.switch_model(self.models[index]):
+            # Drop the model that failed to load so we don't retry it forever
+            self.models.pop(index)
+            if index < self.model_index:
+                self.model_index -= 1
+            self._decided('model', old, old, f"{reason}; failed to load fallback")
+            return
+        self.model_index = index
+        self._decided('model', old, self.models[index], reason)
+
+    def _decided(self, action, old, new, reason):
+        entry = {
+            "time": time.time(),
+            "action": action,
+            "from": old,
+            "to": new,
+            "latency_p90_ms": self.latency_p90,
+            "reason": reason,
+        }
+        self.history.append(entry)
+        SCHED_DECISIONS.inc(action=action)
+        self._publish()
+        self.logger.warning(
+            f"Scheduler: {action} {old} -> {new} ({reason}, p90 latency {self.latency_p90:.1f}ms, "
+            f"budget {self.budget_ms}ms)"
+        )
+        self._samples.clear()
+        self._last_change = entry["time"]
+
+    def _publish(self):
+        SCHED_IMGSZ.set(self.detector.imgsz)
+        SCHED_SKIP.set(self.skip)
+        SCHED_MODEL.set(self.model_index)
+
+    def state(self):
+        return {
+            "enabled": self.enabled,
+            "budget_ms": self.budget_ms,
+            "latency_p90_ms": self.latency_p90,
+            "imgsz": self.detector.imgsz,
+            "model": self.models[self.model_index],
+            "skip": self.skip,
+            "history": list(self.history),
+        }
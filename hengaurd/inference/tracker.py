@@ -0,0 +1,141 @@
+import numpy as np
+import yaml
+from ultralytics.engine.results import Boxes
+from ultralytics.trackers.byte_tracker import BYTETracker
+from ultralytics.trackers.bot_sort import BOTSORT
+from ultralytics.utils import IterableSimpleNamespace
+from ultralytics.utils.checks import check_yaml
+from inference.box_ops import box_iou
+
+TRACKER_MAP = {"bytetrack": BYTETracker, "botsort": BOTSORT}
+
+class StreamTracker:
+    """Per-stream multi-object tracker that works on raw backend detections.
+
+    Ultralytics' own model.track() keeps one tracker per predictor, so frames from different
+    cameras batched into one call would share track state, and exported (ONNX/OpenVINO) models
+    have no tracking step at all. Each stream gets one of these instead.
+    """
+
+    def __init__(self, tracker_cfg="bytetrack.yaml", frame_rate=30):
+        with open(check_yaml(tracker_cfg)) as f:
+            args = IterableSimpleNamespace(**yaml.safe_load(f))
+        self.tracker = TRACKER_MAP[args.tracker_type](args=args, frame_rate=frame_rate)
+
+    def update(self, dets, frame):
+        """Associate [x1, y1, x2, y2, conf, cls] rows; returns [x1, y1, x2, y2, id, conf, cls] rows."""
+        # Empty frames still go through the tracker so lost tracks age out
+        dets = np.asarray(dets, dtype=np.float32).reshape(-1, 6)
+        tracks = self.tracker.update(Boxes(dets, frame.shape[:2]), frame)
+        if len(tracks) == 0:
+            return np.empty((0, 7), dtype=np.float32)
+        return np.asarray(tracks)[:, :7].astype(np.float32)
+
+class IoUTracker:
+    """Cheap tracker for the frames between detector runs (detect-every-N).
+
+    update() associates detections greedily by IoU (same class only) with each track's
+    constant-velocity prediction and refreshes its smoothed center velocity; unmatched detections
+    start new tracks. predict() moves the tracks matched on the last update along their velocity,
+    so IDs and centers keep flowing without running the model. Tracks unmatched for `max_age`
+    seconds are dropped.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_age=1.0, smoothing=0.5):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.smoothing = smoothing
+        self._next_id = 1
+        self.ids = np.empty(0, dtype=np.int64)
+        self.boxes = np.empty((0, 4), dtype=np.float32)     # xyxy at the last observation
+        self.velocity = np.empty((0, 2), dtype=np.float32)  # center velocity, px/s
+        self.confs = np.empty(0, dtype=np.float32)
+        self.classes = np.empty(0, dtype=np.float32)
+        self.seen = np.empty(0, dtype=np.float64)           # time of the last observation
+        self.hits = np.empty(0, dtype=np.int64)
+        self.misses = np.empty(0, dtype=np.int64)           # consecutive updates without a match
+        self.matched = np.empty(0, dtype=bool)              # matched on the last update
+
+    def __len__(self):
+        return len(self.ids)
+
+    def update(self, dets, now):
+        """Associate [x1, y1, x2, y2, conf, cls] rows; returns [x1, y1, x2, y2, id, conf, cls] rows."""
+        dets = np.asarray(dets, dtype=np.float32).reshape(-1, 6)
+        iou = box_iou(self._predicted(now), dets[:, :4])
+        iou[self.classes[:, None] != dets[None, :, 5]] = 0
+        track_idx, det_idx = [], []
+        while iou.size:
+            i, j = np.unravel_index(np.argmax(iou), iou.shape)
+            if iou[i, j] < self.iou_threshold:
+                break
+            track_idx.append(i)
+            det_idx.append(j)
+            iou[i, :] = 0
+            iou[:, j] = 0
+        track_idx = np.asarray(track_idx, dtype=np.int64)
+        det_idx = np.asarray(det_idx, dtype=np.int64)
+
+        if len(track_idx):
+            matched = dets[det_idx]
+            dt = np.maximum(now - self.seen[track_idx], 1e-3)[:, None]
+            measured = (_centers(matched[:, :4]) - _centers(self.boxes[track_idx])) / dt
+            # A track's first match is its first velocity measurement; smooth the ones after that
+            first = (self.hits[track_idx] == 1)[:, None]
+            smoothed = self.smoothing * measured + (1 - self.smoothing) * self.velocity[track_idx]
+            self.velocity[track_idx] = np.where(first, measured, smoothed)
+            self.boxes[track_idx] = matched[:, :4]
+            self.confs[track_idx] = matched[:, 4]
+            self.seen[track_idx] = now
+            self.hits[track_idx] += 1
+        self.matched[:] = False
+        self.matched[track_idx] = True
+        self.misses[~self.matched] += 1
+        self.misses[self.matched] = 0
+
+        new = np.setdiff1d(np.arange(len(dets)), det_idx)
+        if len(new):
+            n = len(new)
+            self.ids = np.concatenate([self.ids, np.arange(self._next_id, self._next_id + n, dtype=np.int64)])
+            self._next_id += n
+            self.boxes = np.concatenate([self.boxes, dets[new, :4]])
+            self.velocity = np.concatenate([self.velocity, np.zeros((n, 2), dtype=np.float32)])
+            self.confs = np.concatenate([self.confs, dets[new, 4]])
+            self.classes = np.concatenate([self.classes, dets[new, 5]])
+            self.seen = np.concatenate([self.seen, np.full(n, now)])
+            self.hits = np.concatenate([self.hits, np.ones(n, dtype=np.int64)])
+            self.misses = np.concatenate([self.misses, np.zeros(n, dtype=np.int64)])
+            self.matched = np.concatenate([self.matched, np.ones(n, dtype=bool)])
+
+        keep = now - self.seen <= self.max_age
+        if not keep.all():
+            for name in ('ids', 'boxes', 'velocity', 'confs', 'classes', 'seen', 'hits', 'misses', 'matched'):
+                setattr(self, name, getattr(self, name)[keep])
+        return self._rows(self.boxes)
+
+    def predict(self, now):
+        """Rows for the tracks matched on the last update, moved to their predicted position at `now`."""
+        return self._rows(self._predicted(now))
+
+    def uncertain(self, confirm_hits=2, min_conf=0.0):
+        """True while a track is unconfirmed or below `min_conf`, or was just missed for the first time."""
+        live = self.matched
+        return bool(
+            (self.misses == 1).any() or
+            (live & (self.hits < confirm_hits)).any() or
+            (live & (self.confs < min_conf)).any()
+        )
+
+    def _predicted(self, now):
+        dt = np.clip(now - self.seen, 0, self.max_age)[:, None]
+        shift = (self.velocity * dt).astype(np.float32)
+        return self.boxes + np.hstack([shift, shift])
+
+    def _rows(self, boxes):
+        live = self.matched
+        return np.column_stack([
+            boxes[live], self.ids[live], self.confs[live], self.classes[live],
+        ]).astype(np.float32).reshape(-1, 7)
+
+def _centers(boxes):
+    return (boxes[:, :2] + boxes[:, 2:]) / 2
@@ -0,0 +1,315 @@
+import logging
+import multiprocessing as mp
+import os
+import time
+from logging.handlers import QueueHandler, QueueListener
+from multiprocessing import shared_memory
+import numpy as np
+from inference.cascade import PERSON_STAGE_SECONDS
+from inference.detector import Detector, DETECTIONS, INFERENCE_SECONDS
+from inference.result_parser import parse_results
+
+def create_detector(cfg, logger, **kwargs):
+    """Detector for a `model:` config; worker: process runs the model in its own process."""
+    if cfg.get('worker', 'thread') == 'process':
+        return ProcessDetector(cfg, logger, **kwargs)
+    return Detector(cfg, logger, **kwargs)
+
+class _ForwardHandler(logging.Handler):
+    def __init__(self, logger):
+        super().__init__()
+        self.logger = logger
+
+    def emit(self, record):
+        self.logger.handle(record)
+
+class ProcessDetector:
+    """Drop-in for Detector that runs the model in a separate process.
+
+    Frames are copied into a ring of shared-memory slots and only (seq, slot, shape) goes over the
+    pipe, so frames are never pickled; the worker sends back compact Detections. A slot is only
+    reused once the worker has answered or dropped its request, and the worker only infers the
+    newest queued frame, so requests left behind by a timeout never pile up. With the model
+    out of this process, JPEG encoding and HTTP threads no longer compete with inference for the
+    GIL, and `worker_cpus` can pin the worker to its own cores. detect() returns [Detections],
+    which parse_results() passes through. Only the single-stream path is supported (no
+    detect_batch); if the worker dies it is restarted on the next frame.
+    """
+
+    def __init__(self, cfg, logger, alert_callback=None, max_failures=10, inference_warn_ms=200):
+        self.cfg = cfg
+        self.logger = logger
+        self.alert_callback = alert_callback
+        self.max_failures = max_failures
+        self.inference_warn_ms = inference_warn_ms
+        self.failure_count = 0
+        self.model_path = cfg['path']
+        self.conf = cfg['conf']
+        self.imgsz = cfg['imgsz']
+        self.names = {}
+        self.imgsz_adjustable = True
+        self.last_inference_ms = None
+        self.last_person_ms = None
+        self.latency_callback = None
+        self.slots = max(2, cfg.get('worker_slots', 3))
+        self.timeout = cfg.get('worker_timeout', 10)
+        self.start_timeout = cfg.get('worker_start_timeout', 120)
+
+        self._ctx = mp.get_context('spawn')  # don't fork a process that already runs camera/HTTP threads
+        self._log_queue = self._ctx.Queue()
+        self._log_listener = QueueListener(self._log_queue, _ForwardHandler(logger))
+        self._log_listener.start()
+        self._shm = None
+        self._slot_bytes = 0
+        self._seq = 0
+        self._pending = {}  # seq -> slot of requests the worker hasn't answered or dropped yet
+        self._proc = None
+        self._conn = None
+        self._start_worker()
+
+    # ---------------- Detector interface ----------------
+    def detect(self, frame):
+        dets = self._request(frame, track=True)
+        if dets is None:
+            return []
+        self._count_classes(dets.classes)
+        return [dets]
+
+    def predict(self, frame):
+        """Raw [x1, y1, x2, y2, conf, cls] rows without tracking, or None on failure (see Detector.predict)."""
+        dets = self._request(frame, track=False)
+        if dets is not None:
+            self._count_classes(dets[:, 5])
+        return dets
+
+    def _request(self, frame, track):
+        if frame is None:
+            self.logger.warning("Detector received None frame. Skipping detection.")
+            self._failed()
+            return None
+
+        try:
+            if not self._proc.is_alive():
+                self.logger.error(f"Inference worker exited (code {self._proc.exitcode}). Restarting it.")
+                self._start_worker()
+            self._seq += 1
+            self._pending[self._seq] = self._write_frame(frame)
+            self._conn.send(('detect', self._seq, self._pending[self._seq], frame.shape, frame.dtype.str, self.imgsz, track))
+            reply = self._wait_for('dets', self._seq, self.timeout)
+        except Exception as e:
+            self.logger.error(f"Detection failed: {e}")
+            self._failed()
+            return None
+
+        if reply is None:
+            self.logger.error(f"Inference worker did not answer within {self.timeout}s. Skipping frame.")
+            self._failed()
+            return None
+        _, _, elapsed_ms, person_ms, dets = reply
+        if dets is None:
+            self._failed()
+            return None
+
+        self.failure_count = 0
+        self._record_latency(elapsed_ms)
+        # Metrics observed in the worker process never reach /metrics; record the cascade's here
+        self.last_person_ms = person_ms
+        if person_ms is not None:
+            PERSON_STAGE_SECONDS.observe(person_ms / 1000)
+        return dets
+
+    def set_imgsz(self, imgsz):
+        # Sent along with every frame, so the worker picks it up on the next detect()
+        self.imgsz = int(imgsz)
+
+    def switch_model(self, path):
+        try:
+            self._conn.send(('model', path))
+            reply = self._wait_for('model', path, self.start_timeout)
+        except Exception as e:
+            self.logger.error(f"Switching model to {path} failed: {e}")
+            return False
+        if reply is None or not reply[2]:
+            return False
+        self.names, self.imgsz_adjustable = reply[3], reply[4]
+        self.model_path = path
+        self.logger.info(f"Switched detection model to {path}")
+        return True
+
+    def close(self):
+        try:
+            if self._proc is not None and self._proc.is_alive():
+                self._conn.send(('stop',))
+                self._proc.join(timeout=5)
+        except Exception as e:
+            self.logger.warning(f"Stopping inference worker failed: {e}")
+        self._stop_worker()
+        self._release_shm()
+        self._log_listener.stop()
+
+    # ---------------- internals ----------------
+    def _start_worker(self):
+        self._stop_worker()
+        self._conn, child_conn = self._ctx.Pipe()
+        self._pending.clear()
+        self._proc = self._ctx.Process(
+            target=_worker_main, args=(self.cfg, child_conn, self._log_queue),
+            name="inference-worker", daemon=True,
+        )
+        self._proc.start()
+        child_conn.close()
+        # A restarted worker needs the current ring again
+        if self._shm is not None:
+            self._conn.send(('attach', self._shm.name, self._slot_bytes))
+        try:
+            reply = self._wait_for('ready', None, self.start_timeout)
+        except EOFError:
+            raise RuntimeError(f"Inference worker exited during startup (code {self._proc.exitcode})")
+        if reply is None:
+            raise RuntimeError(f"Inference worker failed to start within {self.start_timeout}s")
+        if not reply[1]:
+            raise RuntimeError(f"Inference worker failed to load model: {reply[2]}")
+        self.names, self.imgsz_adjustable = reply[2], reply[3]
+        self.logger.info(f"Inference worker started (pid {self._proc.pid}, {self.slots} shared-memory slots)")
+
+    def _stop_worker(self):
+        if self._proc is not None and self._proc.is_alive():
+            self._proc.terminate()
+            self._proc.join(timeout=5)
+        if self._conn is not None:
+            self._conn.close()
+
+    def _write_frame(self, frame):
+        if frame.nbytes > self._slot_bytes:
+            self._release_shm()
+            self._pending.clear()  # the worker drops requests for the old ring when it attaches the new one
+            self._slot_bytes = frame.nbytes
+            self._shm = shared_memory.SharedMemory(create=True, size=self._slot_bytes * self.slots)
+            self._conn.send(('attach', self._shm.name, self._slot_bytes))
+            self.logger.info(f"Allocated {self.slots} x {self._slot_bytes / 1e6:.1f}MB shared frame slots")
+        # Late replies to timed-out requests free their slots
+        while self._conn.poll():
+            self._settle(self._conn.recv())
+        busy = set(self._pending.values())
+        slot = next((s for s in range(self.slots) if s not in busy), None)
+        if slot is None:
+            raise RuntimeError(f"all {self.slots} shared-memory slots are still in use by the inference worker")
+        view = np.ndarray(frame.shape, dtype=frame.dtype, buffer=self._shm.buf, offset=slot * self._slot_bytes)
+        view[...] = frame
+        return slot
+
+    def _release_shm(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+            self._slot_bytes = 0
+
+    def _wait_for(self, kind, key, timeout):
+        """Next reply of `kind` (matching `key`, if given); stale replies from timed-out requests are dropped."""
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0 or not self._conn.poll(remaining):
+                return None
+            reply = self._conn.recv()
+            self._settle(reply)
+            if reply[0] == kind and (key is None or reply[1] == key):
+                return reply
+
+    def _settle(self, reply):
+        if reply[0] in ('dets', 'dropped'):
+            self._pending.pop(reply[1], None)
+
+    def _record_latency(self, elapsed_ms):
+        self.last_inference_ms = elapsed_ms
+        INFERENCE_SECONDS.observe(elapsed_ms / 1000)
+        if self.latency_callback:
+            self.latency_callback(elapsed_ms)
+
+    def _count_classes(self, cls):
+        for c, n in zip(*np.unique(np.asarray(cls, dtype=np.int64), return_counts=True)):
+            DETECTIONS.inc(int(n), **{'class': self.names.get(int(c), str(c))})
+
+    def _failed(self):
+        self.failure_count += 1
+        if self.failure_count >= self.max_failures:
+            msg = (
+                f"Detection pipeline offline: {self.failure_count} consecutive failures. "
+                "Check model, input, or hardware."
+            )
+            self.logger.error(msg)
+            if self.alert_callback:
+                self.alert_callback(msg)
+
+def _worker_main(cfg, conn, log_queue):
+    logger = logging.getLogger("HenGuard.inference")
+    logger.addHandler(QueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    cpus = cfg.get('worker_cpus')
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, cpus)
+            logger.info(f"Inference worker pinned to CPUs {sorted(cpus)}")
+        except OSError as e:
+            logger.warning(f"Could not pin inference worker to CPUs {cpus}: {e}")
+
+    try:
+        detector = Detector(cfg, logger)
+    except Exception as e:
+        conn.send(('ready', False, str(e)))
+        return
+    conn.send(('ready', True, detector.names, detector.imgsz_adjustable))
+
+    shm = None
+    slot_bytes = 0
+    try:
+        while True:
+            # Take everything already queued: control messages run in order, but only the newest
+            # frame is inferred; older ones (left behind by a parent timeout) are dropped
+            msgs = [conn.recv()]
+            while conn.poll():
+                msgs.append(conn.recv())
+            latest = None
+            for msg in msgs:
+                if msg[0] == 'stop':
+                    return
+                if msg[0] in ('detect', 'attach') and latest is not None:
+                    conn.send(('dropped', latest[1]))
+                    latest = None
+                if msg[0] == 'attach':
+                    _close_shm(shm)
+                    shm = shared_memory.SharedMemory(name=msg[1])
+                    slot_bytes = msg[2]
+                elif msg[0] == 'detect':
+                    latest = msg
+                elif msg[0] == 'model':
+                    ok = detector.switch_model(msg[1])
+                    conn.send(('model', msg[1], ok, detector.names, detector.imgsz_adjustable))
+
+            if latest is not None:
+                _, seq, slot, shape, dtype, imgsz, track = latest
+                detector.set_imgsz(imgsz)
+                frame = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=slot * slot_bytes)
+                if track:
+                    results = detector.detect(frame)
+                    dets = parse_results(results, logger) if results else None
+                    del results
+                else:
+                    dets = detector.predict(frame)
+                conn.send(('dets', seq, detector.last_inference_ms, detector.last_person_ms, dets))
+                del frame
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        _close_shm(shm)
+
+def _close_shm(shm):
+    if shm is None:
+        return
+    try:
+        shm.close()
+    except BufferError:
+        pass  # the model still holds a view of the last frame; the mapping goes when that does
@@ -1,61 +1,111 @@
 import numpy as np
 import time
-import json
 import os
+import logging
+from inference.result_parser import HUMAN_CLS, HEN_CLS
+from logic.track_persistence import TrackPersister, load_snapshot
+from logic.track_store import TrackStore
+from utils.metrics import Counter, Gauge
+
+LIVE_TRACKS = Gauge.create("henguard_live_tracks", "Tracks currently held by the theft logic", ["stream"])
+THEFT_FRAMES = Counter.create("henguard_theft_frames_total", "Frames in which theft was detected", ["stream"])
 
 class TheftDetector:
-    def __init__(self, cfg, persist_path=None, save_interval=5, stale_timeout=60):
-        self.tracks = {}
+    def __init__(self, cfg, persist_path=None, save_interval=5, stale_timeout=60, history_depth=5,
+                 cleanup_interval=1.0, logger=None, name="default"):
+        self.tracks = TrackStore(depth=history_depth, stale_timeout=stale_timeout, cleanup_interval=cleanup_interval)
         self.cfg = cfg
+        self.name = name
+        self.logger = logger or logging.getLogger(__name__)
         self.pixel_threshold = cfg.get('pixel_threshold', 120)
         self.persist_path = persist_path
         self.last_save_time = time.time()
         self.save_interval = save_interval  # seconds
         self.stale_timeout = stale_timeout  # seconds
-        if self.persist_path and os.path.exists(self.persist_path):
-            self._load_tracks()
+        self._persister = None
+        if self.persist_path:
+            if os.path.exists(self.persist_path):
+                self._load_tracks()
+            self._persister = TrackPersister(self.persist_path, self.logger)
 
     def update_track(self, tid, x, y):
-        now = time.time()
-        self.tracks.setdefault(tid, []).append((now, x, y))
-        self.tracks[tid] = self.tracks[tid][-5:]
-        self._cleanup_stale_tracks()
-        if self.persist_path and (time.time() - self.last_save_time) > self.save_interval:
+        self.update_tracks([tid], [(x, y)])
+
+    def update_tracks(self, tids, centers, now=None):
+        # Bulk update for a whole frame: one timestamp, one (rate-limited) stale sweep, one save check.
+        # `now` should be the frame's capture time, so queueing delays don't distort velocities.
+        now = time.time() if now is None else now
+        self.tracks.update(tids, centers, now)
+        self.tracks.maybe_evict(now)
+        LIVE_TRACKS.set(len(self.tracks), stream=self.name)
+        if self._persister and (now - self.last_save_time) > self.save_interval:
             self._save_tracks()
-            self.last_save_time = time.time()
+            self.last_save_time = now
 
     def detect(self, humans, hens):
-        for tid, (hx, hy) in humans:
-            track = self.tracks.get(tid, [])
-            if len(track) < 2:
-                continue
-            t0, x0, y0 = track[0]
-            t1, x1, y1 = track[-1]
-            dt = max(t1 - t0, 1e-3)
-            velocity = np.linalg.norm([x1-x0, y1-y0]) / dt
-            nearby = sum(1 for x, y in hens if np.linalg.norm([hx-x, hy-y]) < self.pixel_threshold)
-            if velocity > self.cfg['velocity_threshold'] and nearby >= self.cfg['theft_hens']:
-                return True
-        return False
+        if not humans:
+            return False
+        ids = np.array([tid for tid, _ in humans], dtype=np.int64)
+        positions = np.array([pos for _, pos in humans], dtype=np.float32)
+        hen_positions = np.asarray(hens, dtype=np.float32).reshape(-1, 2)
+        return len(self.detect_batch(ids, positions, self.velocities(ids), hen_positions)) > 0
+
+    def detect_frame(self, dets):
+        """Track IDs of humans in a parsed frame (inference.result_parser.Detections) that trigger theft."""
+        humans = dets.classes == HUMAN_CLS
+        ids = dets.ids[humans]
+        triggered = self.detect_batch(ids, dets.centers[humans], self.velocities(ids), dets.centers[dets.classes == HEN_CLS])
+        if len(triggered):
+            THEFT_FRAMES.inc(stream=self.name)
+        return triggered
+
+    def detect_batch(self, human_ids, human_positions, human_velocities, hen_positions):
+        """Vectorized theft check for all humans in a frame.
+
+        human_positions / human_velocities are (H, 2) arrays (velocity in px/s, NaN when unknown),
+        hen_positions is (N, 2). Returns the human track IDs that are moving faster than
+        velocity_threshold with at least theft_hens hens within pixel_threshold.
+        """
+        human_ids = np.asarray(human_ids)
+        if len(human_ids) == 0:
+            return human_ids
+        hp = np.asarray(human_positions, dtype=np.float32).reshape(-1, 2)
+        hn = np.asarray(hen_positions, dtype=np.float32).reshape(-1, 2)
+        speed = np.hypot(*np.asarray(human_velocities, dtype=np.float32).reshape(-1, 2).T)
+
+        diff = hp[:, None, :] - hn[None, :, :]
+        dist2 = np.einsum('hnk,hnk->hn', diff, diff)
+        nearby = np.count_nonzero(dist2 < self.pixel_threshold ** 2, axis=1)
+
+        triggered = (speed > self.cfg['velocity_threshold']) & (nearby >= self.cfg['theft_hens'])
+        return human_ids[triggered]
+
+    def velocities(self, tids):
+        """(N, 2) px/s velocity over each track's stored history; NaN for tracks with < 2 points."""
+        return self.tracks.velocities(tids)
 
     def _cleanup_stale_tracks(self):
-        now = time.time()
-        stale_tids = [tid for tid, positions in self.tracks.items()
-                      if positions and now - positions[-1][0] > self.stale_timeout]
-        for tid in stale_tids:
-            del self.tracks[tid]
+        self.tracks.evict_stale(time.time())
 
     def _save_tracks(self):
-        try:
-            with open(self.persist_path, 'w') as f:
-                json.dump({tid: track[-5:] for tid, track in self.tracks.items()}, f)
-        except Exception:
-            pass
+        # Only the snapshot copy happens here; the write runs on the persister thread
+        self._persister.submit(self.tracks.snapshot())
 
     def _load_tracks(self):
-        try:
-            with open(self.persist_path, 'r') as f:
-                self.tracks = json.load(f)
-                self.tracks = {int(tid): [tuple(pos) for pos in track] for tid, track in self.tracks.items()}
-        except Exception:
-            self.tracks = {}
+        start = time.time()
+        snap = load_snapshot(self.persist_path, self.logger)
+        if snap is None:
+            return
+        if "tids" in snap:
+            self.tracks.restore(snap)
+        else:
+            self.tracks.load(snap)
+        self.tracks.evict_stale(time.time())
+        self.logger.info(
+            f"Restored {len(self.tracks)} tracks from {self.persist_path} in {(time.time() - start) * 1000:.1f}ms"
+        )
+
+    def close(self):
+        if self._persister:
+            self._save_tracks()
+            self._persister.close()
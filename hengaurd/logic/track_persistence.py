@@ -0,0 +1,102 @@
+import json
+import logging
+import os
+import threading
+import time
+import zipfile
+import numpy as np
+
+FORMAT_VERSION = 1
+
+class TrackPersister:
+    """Writes TrackStore snapshots on a background thread.
+
+    submit() only swaps a reference, so the detection thread never waits on disk. The writer keeps
+    just the newest pending snapshot, stores it as an uncompressed .npz and publishes it with an
+    fsync + atomic rename, so a power loss leaves either the old or the new file, never a torn one.
+    """
+
+    def __init__(self, path, logger=None):
+        self.path = path
+        self.logger = logger or logging.getLogger(__name__)
+        self.writes = 0
+        self.last_write_ms = None
+        self._pending = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="track-persister", daemon=True)
+        self._thread.start()
+
+    def submit(self, snapshot):
+        with self._lock:
+            self._pending = snapshot
+        self._wake.set()
+
+    def close(self, timeout=5):
+        """Write whatever is still pending and stop the writer thread."""
+        self._stop = True
+        self._wake.set()
+        self._thread.join(timeout=timeout)
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            with self._lock:
+                snapshot, self._pending = self._pending, None
+            if snapshot is not None:
+                self._write(snapshot)
+            if self._stop:
+                return
+
+    def _write(self, snapshot):
+        start = time.time()
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, 'wb') as f:
+                np.savez(f, version=np.int32(FORMAT_VERSION), saved_at=np.float64(start), **snapshot)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            self._fsync_dir()
+            self.writes += 1
+            self.last_write_ms = (time.time() - start) * 1000
+        except Exception as e:
+            self.logger.error(f"Saving tracks to {self.path} failed: {e}")
+
+    def _fsync_dir(self):
+        # Make the rename itself durable; not supported on every platform
+        try:
+            fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+def load_snapshot(path, logger=None):
+    """Read a snapshot written by TrackPersister; also accepts the legacy JSON track file.
+
+    Returns a snapshot dict, {tid: [(t, x, y), ...]} for legacy files, or None if unreadable.
+    """
+    logger = logger or logging.getLogger(__name__)
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            return {key: data[key] for key in ("tids", "count", "head", "times", "xy")}
+    except (zipfile.BadZipFile, ValueError):
+        pass
+    except Exception as e:
+        logger.warning(f"Could not read track file {path}: {e}")
+        return None
+
+    try:
+        with open(path, 'r') as f:
+            tracks = json.load(f)
+        return {int(tid): [tuple(pos) for pos in track] for tid, track in tracks.items()}
+    except Exception as e:
+        logger.warning(f"Discarding unreadable track file {path}: {e}")
+        return None
@@ -0,0 +1,169 @@
+import heapq
+import numpy as np
+
+class TrackStore:
+    """Fixed-depth position history per track, kept in preallocated NumPy ring buffers.
+
+    Each track owns one slot (row) of the buffers; slots are recycled through a free list and the
+    buffers double when full. Stale tracks are found through a min-heap of last-seen times that
+    holds at most one entry per track, so eviction cost depends on how many tracks expire rather
+    than on how many are alive, and it only runs every `cleanup_interval` seconds.
+    """
+
+    def __init__(self, depth=5, stale_timeout=60, cleanup_interval=1.0, capacity=64):
+        self.depth = depth
+        self.stale_timeout = stale_timeout
+        self.cleanup_interval = cleanup_interval
+        self._times = np.zeros((capacity, depth), dtype=np.float64)
+        self._xy = np.zeros((capacity, depth, 2), dtype=np.float32)
+        self._count = np.zeros(capacity, dtype=np.int32)
+        self._head = np.zeros(capacity, dtype=np.int32)
+        self._last_seen = np.zeros(capacity, dtype=np.float64)
+        self._slots = {}
+        self._free = list(range(capacity - 1, -1, -1))
+        self._heap = []
+        self._in_heap = set()
+        self._next_cleanup = 0.0
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, tid):
+        return tid in self._slots
+
+    def _grow(self):
+        old = len(self._count)
+        for name in ('_times', '_xy', '_count', '_head', '_last_seen'):
+            arr = getattr(self, name)
+            setattr(self, name, np.concatenate([arr, np.zeros_like(arr)]))
+        self._free.extend(range(2 * old - 1, old - 1, -1))
+
+    def _slot_for(self, tid, now):
+        slot = self._slots.get(tid)
+        if slot is None:
+            if not self._free:
+                self._grow()
+            slot = self._free.pop()
+            self._slots[tid] = slot
+            self._count[slot] = 0
+            self._head[slot] = 0
+            if tid not in self._in_heap:
+                heapq.heappush(self._heap, (now, tid))
+                self._in_heap.add(tid)
+        return slot
+
+    def update(self, tids, centers, now):
+        """Append one (now, x, y) sample for each track; tids must be unique within a call."""
+        if len(tids) == 0:
+            return
+        if hasattr(tids, 'tolist'):
+            tids = tids.tolist()
+        slots = np.fromiter((self._slot_for(tid, now) for tid in tids), dtype=np.intp, count=len(tids))
+        head = self._head[slots]
+        self._times[slots, head] = now
+        self._xy[slots, head] = centers
+        self._head[slots] = (head + 1) % self.depth
+        self._count[slots] = np.minimum(self._count[slots] + 1, self.depth)
+        self._last_seen[slots] = now
+
+    def remove(self, tid):
+        slot = self._slots.pop(tid, None)
+        if slot is not None:
+            self._count[slot] = 0
+            self._free.append(slot)
+
+    def maybe_evict(self, now):
+        if now >= self._next_cleanup:
+            self.evict_stale(now)
+            self._next_cleanup = now + self.cleanup_interval
+
+    def evict_stale(self, now):
+        cutoff = now - self.stale_timeout
+        while self._heap and self._heap[0][0] < cutoff:
+            _, tid = heapq.heappop(self._heap)
+            self._in_heap.discard(tid)
+            slot = self._slots.get(tid)
+            if slot is None:
+                continue
+            last_seen = self._last_seen[slot]
+            if last_seen < cutoff:
+                self.remove(tid)
+            else:
+                # Seen since this entry was pushed: requeue at its real last-seen time
+                heapq.heappush(self._heap, (float(last_seen), tid))
+                self._in_heap.add(tid)
+
+    def velocities(self, tids):
+        """(N, 2) px/s velocity from oldest to newest stored sample; NaN with < 2 samples."""
+        out = np.full((len(tids), 2), np.nan, dtype=np.float32)
+        idx = [(i, self._slots[tid]) for i, tid in enumerate(np.asarray(tids).tolist()) if tid in self._slots]
+        if not idx:
+            return out
+        rows, slots = map(np.asarray, zip(*idx))
+        count = self._count[slots]
+        ok = count >= 2
+        rows, slots, count = rows[ok], slots[ok], count[ok]
+        newest = (self._head[slots] - 1) % self.depth
+        oldest = (self._head[slots] - count) % self.depth
+        dt = np.maximum(self._times[slots, newest] - self._times[slots, oldest], 1e-3)
+        out[rows] = (self._xy[slots, newest] - self._xy[slots, oldest]) / dt[:, None]
+        return out
+
+    def history(self, tid):
+        """[(t, x, y), ...] oldest first."""
+        slot = self._slots.get(tid)
+        if slot is None:
+            return []
+        count = int(self._count[slot])
+        order = (self._head[slot] - count + np.arange(count)) % self.depth
+        return [(float(t), float(x), float(y)) for t, (x, y) in zip(self._times[slot, order], self._xy[slot, order])]
+
+    def items(self):
+        for tid in list(self._slots):
+            yield tid, self.history(tid)
+
+    def load(self, tracks):
+        """Replace the contents with {tid: [(t, x, y), ...]} (oldest first)."""
+        for tid in list(self._slots):
+            self.remove(tid)
+        for tid, track in tracks.items():
+            for t, x, y in track[-self.depth:]:
+                self.update([tid], np.array([[x, y]], dtype=np.float32), t)
+
+    def snapshot(self):
+        """Copy of the live tracks as plain arrays (cheap: a few fancy-indexed copies)."""
+        tids = np.fromiter(self._slots.keys(), dtype=np.int64, count=len(self._slots))
+        slots = np.fromiter(self._slots.values(), dtype=np.intp, count=len(self._slots))
+        return {
+            "tids": tids,
+            "count": self._count[slots],
+            "head": self._head[slots],
+            "times": self._times[slots],
+            "xy": self._xy[slots],
+        }
+
+    def restore(self, snap):
+        """Replace the contents with a snapshot() taken earlier (possibly by another process)."""
+        times, xy, count, head = snap["times"], snap["xy"], snap["count"], snap["head"]
+        tids = np.asarray(snap["tids"], dtype=np.int64).tolist()
+        if times.ndim != 2 or times.shape[1] != self.depth:
+            # Saved with a different history depth: replay the samples instead
+            tracks = {}
+            for i, tid in enumerate(tids):
+                order = (head[i] - count[i] + np.arange(count[i])) % times.shape[1]
+                tracks[tid] = [(t, x, y) for t, (x, y) in zip(times[i, order].tolist(), xy[i, order].tolist())]
+            self.load(tracks)
+            return
+
+        for tid in list(self._slots):
+            self.remove(tid)
+        while len(self._free) < len(tids):
+            self._grow()
+        slots = np.array([self._free.pop() for _ in tids], dtype=np.intp)
+        self._slots = dict(zip(tids, slots.tolist()))
+        self._times[slots], self._xy[slots] = times, xy
+        self._count[slots], self._head[slots] = count, head
+        newest = (head - 1) % self.depth
+        self._last_seen[slots] = times[np.arange(len(tids)), newest] if len(tids) else 0
+        self._heap = sorted(zip(self._last_seen[slots].tolist(), tids))
+        self._in_heap = set(tids)
@@ -1,34 +1,71 @@
 import os
 import yaml
-import cv2
 import sys
 from utils.logger import setup_logger
-from camera.camera_manager import CameraManager
-from inference.detector import Detector
+from inference.worker import create_detector
+from inference.keyframes import KeyframeDetector
+from inference.motion_gate import MotionGate
+from inference.scheduler import AdaptiveScheduler
 from logic.theft_detector import TheftDetector
+from engine.multi_camera import MultiCameraEngine
+from engine.pipeline import Pipeline
+from engine.sinks import AlertSink, GuiSink, RecorderSink
+from engine.sources import create_source
+from display.overlay_renderer import OverlayRenderer
+from display.viewer import Viewer, resolve_display_mode
 from alerts.buzzer import Buzzer
 from alerts.gsm_manager import SIM900
 from alerts.alert_manager import AlertManager
 
 def validate_config(cfg):
-    required = ['camera', 'model', 'zones', 'alerts']
+    required = ['model', 'zones', 'alerts']
     for key in required:
         if key not in cfg:
             raise ValueError(f"Missing config key: {key}")
+    if 'camera' not in cfg and not cfg.get('cameras'):
+        raise ValueError("Missing config key: camera (or cameras)")
     alerts_cfg = cfg['alerts']
     for key in ['buzzer_gpio', 'gsm', 'cooldown']:
         if key not in alerts_cfg:
             raise ValueError(f"Missing alert config key: {key}")
 
+def renderer_config(display_cfg, viewer):
+    # Nothing is drawn headless; with a viewer, don't draw faster than it can show
+    return {
+        **display_cfg,
+        "enabled": viewer is not None,
+        "draw_fps": display_cfg.get("draw_fps") or (viewer.max_fps if viewer else 0),
+    }
+
+def run_multi_camera(engine, alert_mgr, display_cfg, viewer, logger):
+    renderers = {ch.name: OverlayRenderer(renderer_config(display_cfg, viewer), logger) for ch in engine.channels}
+    while True:
+        for name in engine.offline_too_long():
+            alert_mgr.trigger(f"CAMERA OFFLINE TOO LONG [{name}]")
+
+        for ch, frame, results, dets, suspects in engine.step():
+            if len(suspects) > 0:
+                alert_mgr.trigger(f"HEN THEFT DETECTED [{ch.name}]")
+            renderer = renderers[ch.name]
+            if results:
+                renderer.update(dets, suspects)
+            if viewer is None or not viewer.active:
+                continue  # headless, or the viewer failed: don't draw frames nobody sees
+            view = renderer.render(frame)
+            if view is not None:
+                viewer.show(f"THEFT DETECTION - {ch.name}", view)
+
+        if viewer and viewer.quit_requested.is_set():
+            break
+
 def main():
     logger = setup_logger()
+    pipeline = None
     try:
         with open("config.yaml") as f:
             cfg = yaml.safe_load(f)
         validate_config(cfg)
 
-        camera = CameraManager(cfg['camera'], logger)
-
         model_cfg = cfg['model']
         model_path = model_cfg.get('path', 'models/yolov8n.pt')
 
@@ -37,65 +74,91 @@ def main():
                 f"Model file '{model_path}' not found. Falling back to pretrained yolov8n.pt"
             )
             model_path = 'yolov8n.pt'
+            model_cfg = {**model_cfg, "backend": "auto"}
+
+        multi_camera = bool(cfg.get('cameras'))
+        if multi_camera and model_cfg.get('worker') == 'process':
+            logger.warning("model.worker: process is single-camera only; running batched inference in-process.")
+            model_cfg = {**model_cfg, "worker": "thread"}
 
-        detector = Detector(
+        detector = create_detector(
             {
+                **model_cfg,
                 "path": model_path,
                 "conf": model_cfg.get("conf", 0.4),
-                "imgsz": model_cfg.get("imgsz", 416)
+                "imgsz": model_cfg.get("imgsz", 416),
+                "zones": cfg['zones'],
             },
             logger
         )
 
-        theft_logic = TheftDetector(cfg['zones'])
+        scheduler = AdaptiveScheduler(cfg.get('scheduler', {}), detector, logger)
+        if multi_camera:
+            camera = MultiCameraEngine(cfg, detector, logger, scheduler=scheduler)
+            theft_logic = None  # every camera has its own TheftDetector inside the engine
+        else:
+            camera = create_source(cfg['camera'], logger)
+            theft_logic = TheftDetector(cfg['zones'], persist_path=cfg['zones'].get('persist_path'), logger=logger)
+        motion_gate = MotionGate(cfg.get('motion', {}), logger)
+        keyframes = KeyframeDetector(cfg.get('keyframes', {}), detector, logger)
+        if multi_camera and keyframes.enabled:
+            logger.warning("keyframes is single-camera only; batched multi-camera inference runs on every frame.")
+        display_cfg = cfg.get('display', {})
+        display_mode = resolve_display_mode(display_cfg)
+        viewer = Viewer(display_cfg, logger) if display_mode == 'viewer' else None
+        logger.info(f"Display mode: {display_mode}")
         buzzer = Buzzer(cfg['alerts']['buzzer_gpio'], logger)
-        gsm = SIM900(cfg['alerts']['gsm'])
+        gsm = SIM900(cfg['alerts']['gsm'], logger)
 
         continuous_alarm = cfg['alerts'].get('continuous_alarm', False)
         alert_mgr = AlertManager(
-            buzzer, gsm, cfg['alerts']['cooldown'], logger, continuous_alarm=continuous_alarm
+            buzzer, gsm, cfg['alerts']['cooldown'], logger, continuous_alarm=continuous_alarm,
+            max_queue=cfg['alerts'].get('max_queue', 8), coalesce_window=cfg['alerts'].get('coalesce_window')
         )
 
-        while True:
-            if camera.camera_offline_too_long:
-                alert_mgr.trigger("CAMERA OFFLINE TOO LONG")
-
-            ret, frame = camera.read()
-            if not ret:
-                continue
-
-            results = detector.detect(frame)
-            humans, hens = [], []
-
-            if results:
-                try:
-                    if hasattr(results[0], 'boxes') and getattr(results[0].boxes, 'id', None) is not None:
-                        for box in results[0].boxes:
-                            tid = int(box.id)
-                            cls = int(box.cls)
-                            x1, y1, x2, y2 = map(int, box.xyxy[0])
-                            cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
-                            theft_logic.update_track(tid, cx, cy)
-                            if cls == 0:
-                                humans.append((tid, (cx, cy)))
-                            elif cls == 1:
-                                hens.append((cx, cy))
-                except Exception as e:
-                    logger.warning(f"Error processing detection results: {e}")
-
-            if theft_logic.detect(humans, hens):
-                alert_mgr.trigger("HEN THEFT DETECTED")
-
-            cv2.imshow("THEFT DETECTION", results[0].plot() if results else frame)
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
+        if multi_camera:
+            run_multi_camera(camera, alert_mgr, display_cfg, viewer, logger)
+            return
+
+        sinks = [AlertSink(alert_mgr.trigger)]
+        if viewer:
+            sinks.append(GuiSink(viewer, OverlayRenderer(renderer_config(display_cfg, viewer), logger)))
+        record_cfg = cfg.get('record', {})
+        if record_cfg.get('enabled'):
+            # Every frame goes into the recording, so draw on every frame regardless of the GUI rate
+            recorder_renderer = OverlayRenderer({**display_cfg, "enabled": True, "draw_fps": 0}, logger)
+            sinks.append(RecorderSink(
+                record_cfg.get('path', 'logs/recording.mp4'), record_cfg.get('fps', cfg['camera'].get('fps', 6)),
+                recorder_renderer, logger, codec=record_cfg.get('codec', 'mp4v')
+            ))
+
+        pipeline = Pipeline(camera, detector, theft_logic, logger, motion_gate=motion_gate, scheduler=scheduler,
+                            sinks=sinks, keyframes=keyframes)
+        pipeline.run()
 
     except Exception as e:
         logger.error(f"Fatal error: {e}")
         sys.exit(1)
     finally:
         try:
-            camera.release()
+            if pipeline is not None:
+                pipeline.stop()
+            else:
+                camera.release()
+        except Exception:
+            pass
+        try:
+            if hasattr(detector, 'close'):
+                detector.close()
+        except Exception:
+            pass
+        try:
+            if theft_logic is not None:
+                theft_logic.close()
+        except Exception:
+            pass
+        try:
+            alert_mgr.close()
         except Exception:
             pass
         try:
@@ -111,7 +174,11 @@ def main():
             gsm.cleanup()
         except Exception:
             pass
-        cv2.destroyAllWindows()
+        try:
+            if viewer:
+                viewer.close()
+        except Exception:
+            pass
 
 if __name__ == "__main__":
     main()
@@ -1,18 +1,27 @@
+import os
 import yaml
-import cv2
 import sys
 import threading
-import time
 
-from flask import Flask, Response
+from flask import Flask, Response, jsonify, request
 from utils.logger import setup_logger
-from camera.camera_manager import CameraManager
-from inference.detector import Detector
+from inference.worker import create_detector
+from inference.keyframes import KeyframeDetector
+from inference.motion_gate import MotionGate
+from inference.scheduler import AdaptiveScheduler
 from logic.theft_detector import TheftDetector
+from display.overlay_renderer import OverlayRenderer
+from engine.pipeline import Pipeline
+from engine.sinks import AlertSink, MjpegSink
+from engine.sources import create_source
+from streaming.broadcaster import FrameBroadcaster
+from streaming.events import EventBroadcaster
+from utils.metrics import REGISTRY
 
 # ---------------- GLOBAL SHARED STATE ----------------
-latest_frame = None
-lock = threading.Lock()
+broadcaster = FrameBroadcaster()
+events = EventBroadcaster()
+scheduler = None  # AdaptiveScheduler, set once detection_loop has built it
 # ----------------------------------------------------
 
 app = Flask(__name__)
@@ -24,88 +33,84 @@ def validate_config(cfg):
             raise ValueError(f"Missing config key: {key}")
 
 # ---------------- MJPEG STREAM ----------------
-def frame_generator():
-    while True:
-        with lock:
-            frame = latest_frame
-        if frame is None:
-            time.sleep(0.01)
-            continue
-
-        _, buffer = cv2.imencode(".jpg", frame)
-        frame_bytes = buffer.tobytes()
-
-        yield (
-            b"--frame\r\n"
-            b"Content-Type: image/jpeg\r\n\r\n"
-            + frame_bytes +
-            b"\r\n"
-        )
-
 @app.route("/video")
 def video_feed():
+    # /video?profile=thumb selects one of the stream.profiles from config.yaml
+    profile = request.args.get("profile", broadcaster.default_profile)
+    if profile not in broadcaster.profiles:
+        return Response(
+            f"Unknown stream profile '{profile}'. Available: {', '.join(broadcaster.profiles)}\n",
+            status=404,
+            mimetype="text/plain"
+        )
     return Response(
-        frame_generator(),
+        broadcaster.stream(profile),
         mimetype="multipart/x-mixed-replace; boundary=frame"
     )
+
+@app.route("/events")
+def event_feed():
+    # Per-frame boxes / track IDs / classes / theft state as Server-Sent Events
+    return Response(
+        events.stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route("/viewer")
+def viewer():
+    # Draws the /events overlays client-side on top of a raw (overlay: false) profile
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "streaming", "viewer.html")) as f:
+        return Response(f.read(), mimetype="text/html")
+
+@app.route("/metrics")
+def metrics():
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/scheduler")
+def scheduler_state():
+    # Current imgsz / model / skip and the recent decisions of the adaptive scheduler
+    if scheduler is None:
+        return Response("Detection is still starting\n", status=503, mimetype="text/plain")
+    return jsonify(scheduler.state())
 # ----------------------------------------------------
 
 def detection_loop():
-    global latest_frame
+    global scheduler
     logger = setup_logger()
 
     try:
         with open("config.yaml") as f:
             cfg = yaml.safe_load(f)
         validate_config(cfg)
+        broadcaster.configure(cfg.get("stream", {}))
 
-        camera = CameraManager(cfg["camera"], logger)
+        source = create_source(cfg["camera"], logger)
 
         model_cfg = cfg["model"]
-        detector = Detector(
+        detector = create_detector(
             {
+                **model_cfg,
                 "path": model_cfg.get("path", "models/yolov8n.pt"),
                 "conf": model_cfg.get("conf", 0.4),
                 "imgsz": model_cfg.get("imgsz", 416),
+                "zones": cfg["zones"],
             },
             logger
         )
 
-        theft_logic = TheftDetector(cfg["zones"])
-
-        while True:
-            ret, frame = camera.read()
-            if not ret:
-                continue
-
-            results = detector.detect(frame)
-            humans, hens = [], []
-
-            if results:
-                try:
-                    if hasattr(results[0], "boxes") and getattr(results[0].boxes, "id", None) is not None:
-                        for box in results[0].boxes:
-                            tid = int(box.id)
-                            cls = int(box.cls)
-                            x1, y1, x2, y2 = map(int, box.xyxy[0])
-                            cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
-
-                            theft_logic.update_track(tid, cx, cy)
-
-                            if cls == 0:
-                                humans.append((tid, (cx, cy)))
-                            elif cls == 1:
-                                hens.append((cx, cy))
-                except Exception as e:
-                    logger.warning(f"Detection parse error: {e}")
-
-            if theft_logic.detect(humans, hens):
-                logger.info("THEFT DETECTED!")
-
-            output_frame = results[0].plot() if results else frame
-
-            with lock:
-                latest_frame = output_frame
+        theft_logic = TheftDetector(cfg["zones"], logger=logger)
+        motion_gate = MotionGate(cfg.get("motion", {}), logger)
+        scheduler = AdaptiveScheduler(cfg.get("scheduler", {}), detector, logger)
+        keyframes = KeyframeDetector(cfg.get("keyframes", {}), detector, logger)
+        renderer = OverlayRenderer(cfg.get("display", {}), logger)
+
+        sinks = [
+            MjpegSink(broadcaster, renderer, detector, events=events),
+            AlertSink(logger.info),
+        ]
+        Pipeline(source, detector, theft_logic, logger, motion_gate=motion_gate, scheduler=scheduler,
+                 sinks=sinks, keyframes=keyframes).run()
 
     except Exception as e:
         logger.error(f"Fatal detection error: {e}")
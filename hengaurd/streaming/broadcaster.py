@@ -0,0 +1,158 @@
+import cv2
+import logging
+import threading
+import time
+from utils.metrics import Counter, Gauge
+
+MJPEG_CLIENTS = Gauge.create("henguard_mjpeg_clients", "Connected /video clients", ["profile"])
+ENCODED_FRAMES = Counter.create("henguard_mjpeg_encoded_frames_total", "Frames JPEG-encoded for streaming", ["profile"])
+
+class StreamProfile:
+    """One output rendition of the stream plus its shared, most recent encoding."""
+
+    def __init__(self, name, width=None, quality=80, max_fps=None, overlay=True):
+        self.name = name
+        self.width = width
+        self.quality = quality
+        self.period = 1.0 / max_fps if max_fps else 0.0
+        self.overlay = overlay
+        self.clients = 0
+        self.jpeg = None
+        self.jpeg_seq = 0
+        self.next_due = 0.0
+        self.lock = threading.Lock()
+
+    def encode(self, frame):
+        h, w = frame.shape[:2]
+        if self.width and w > self.width:
+            frame = cv2.resize(frame, (self.width, max(1, round(h * self.width / w))), interpolation=cv2.INTER_AREA)
+        ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        return buffer.tobytes() if ok else None
+
+class FrameBroadcaster:
+    """Fans the newest frame out to any number of MJPEG clients, per stream profile.
+
+    The producer only publishes a reference. Each profile encodes a frame at most once, by
+    whichever of its clients asks first and no more often than its max_fps; every other client of
+    that profile gets the same bytes. Clients wait on a condition until the sequence number moves
+    past the one they last sent and then always take the newest frame, so a slow client skips
+    frames instead of queuing them. Profiles with overlay: false stream the raw frame, for clients
+    that draw boxes themselves from the /events metadata. Overlay profiles only ever get annotated
+    frames: when drawing is throttled (display.draw_fps) they wait for the next drawing instead
+    of falling back to the raw frame.
+    """
+
+    def __init__(self, cfg=None, logger=None):
+        self.logger = logger or logging.getLogger(__name__)
+        self._frame = None
+        self._annotated = None
+        self._annotated_seq = 0  # seq of the frame _annotated was drawn on
+        self._seq = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self.configure(cfg or {})
+
+    def configure(self, cfg):
+        quality = cfg.get('quality', 80)
+        profiles = cfg.get('profiles') or {'full': {}}
+        self.profiles = {
+            name: StreamProfile(
+                name, p.get('width'), p.get('quality', quality), p.get('max_fps'), p.get('overlay', True)
+            )
+            for name, p in profiles.items()
+        }
+        self.default_profile = cfg.get('default_profile', next(iter(self.profiles)))
+        if self.default_profile not in self.profiles:
+            raise ValueError(f"Unknown default stream profile: {self.default_profile}")
+
+    @property
+    def wants_overlay(self):
+        """True if any client is watching an annotated profile; otherwise drawing can be skipped."""
+        return any(p.overlay and p.clients for p in self.profiles.values())
+
+    def publish(self, frame, annotated=None):
+        """Publish a raw frame and optionally its annotated copy; returns the new sequence number.
+
+        Both arrays are handed over: the caller must not modify them afterwards.
+        """
+        with self._cond:
+            self._frame = frame
+            self._seq += 1
+            if annotated is not None:
+                self._annotated, self._annotated_seq = annotated, self._seq
+            elif not self.wants_overlay:
+                self._annotated = None  # don't show a stale drawing to the next overlay client
+            self._cond.notify_all()
+            return self._seq
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def next_jpeg(self, profile, last_seq, timeout=1.0):
+        """Wait for a frame newer than last_seq; returns (seq, jpeg bytes), (last_seq, None) on timeout
+        or (seq, None) when encoding frame seq failed."""
+        if profile.jpeg_seq > last_seq:
+            # Another subscriber already paid for a newer encoding
+            return profile.jpeg_seq, profile.jpeg
+        delay = profile.next_due - time.monotonic()
+        if delay > 0:
+            time.sleep(min(delay, timeout))
+            if profile.jpeg_seq > last_seq:
+                return profile.jpeg_seq, profile.jpeg
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._newest(profile)[0] > last_seq or self._closed, timeout):
+                return last_seq, None
+            if self._closed:
+                return last_seq, None
+            seq, frame = self._newest(profile)
+        return self._encoded(profile, seq, frame)
+
+    def _newest(self, profile):
+        if profile.overlay:
+            return (self._annotated_seq, self._annotated) if self._annotated is not None else (0, None)
+        return (self._seq, self._frame) if self._frame is not None else (0, None)
+
+    def _encoded(self, profile, seq, frame):
+        with profile.lock:
+            now = time.monotonic()
+            # Never replace a newer encoding with an older one, and respect the profile's rate
+            if profile.jpeg_seq < seq and now >= profile.next_due:
+                jpeg = profile.encode(frame)
+                if jpeg is None:
+                    self.logger.warning(f"JPEG encoding failed for stream profile {profile.name}")
+                    return seq, None
+                profile.jpeg, profile.jpeg_seq = jpeg, seq
+                profile.next_due = now + profile.period
+                ENCODED_FRAMES.inc(profile=profile.name)
+            return profile.jpeg_seq, profile.jpeg
+
+    def stream(self, profile_name=None):
+        """multipart/x-mixed-replace body for one client of the given profile."""
+        profile = self.profiles[profile_name or self.default_profile]
+        with profile.lock:
+            profile.clients += 1
+        MJPEG_CLIENTS.inc(profile=profile.name)
+        try:
+            seq = 0
+            while not self._closed:
+                new_seq, jpeg = self.next_jpeg(profile, seq)
+                if jpeg is None:
+                    # Timed out, or encoding this frame failed: wait for the next one instead of retrying
+                    seq = max(seq, new_seq)
+                    continue
+                if new_seq <= seq:
+                    continue
+                seq = new_seq
+                yield (
+                    b"--frame\r\n"
+                    b"Content-Type: image/jpeg\r\n\r\n"
+                    + jpeg +
+                    b"\r\n"
+                )
+        finally:
+            # Runs when the client disconnects and the server closes the generator
+            with profile.lock:
+                profile.clients -= 1
+            MJPEG_CLIENTS.dec(profile=profile.name)
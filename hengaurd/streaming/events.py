@@ -0,0 +1,66 @@
+import json
+import threading
+import time
+from utils.metrics import Gauge
+
+SSE_CLIENTS = Gauge.create("henguard_event_clients", "Connected /events clients")
+
+def frame_metadata(seq, frame, dets, suspects, names, inferred=True):
+    """Compact per-frame overlay data; boxes are xyxy in source-frame pixels."""
+    return {
+        "seq": seq,
+        "time": round(time.time(), 3),
+        "width": int(frame.shape[1]),
+        "height": int(frame.shape[0]),
+        "inferred": inferred,
+        "theft": bool(len(suspects)),
+        "suspects": [int(tid) for tid in suspects],
+        "ids": dets.ids.tolist(),
+        "classes": [names.get(int(c), str(c)) for c in dets.classes.tolist()],
+        "boxes": dets.boxes.tolist(),
+        "confs": [round(c, 2) for c in dets.confs.tolist()],
+    }
+
+class EventBroadcaster:
+    """Server-Sent Events fan-out of per-frame metadata.
+
+    Each event is serialized once and shared by every client. Like FrameBroadcaster, clients only
+    ever receive the newest event, so a slow client skips frames instead of queuing them.
+    """
+
+    def __init__(self, keepalive=15):
+        self.keepalive = keepalive
+        self._event = None
+        self._seq = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def publish(self, seq, metadata):
+        data = f"id: {seq}\ndata: {json.dumps(metadata, separators=(',', ':'))}\n\n".encode()
+        with self._cond:
+            self._event = data
+            self._seq = seq
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def stream(self):
+        """text/event-stream body for one client."""
+        SSE_CLIENTS.inc()
+        try:
+            seq = 0
+            while not self._closed:
+                with self._cond:
+                    if not self._cond.wait_for(lambda: self._seq != seq or self._closed, self.keepalive):
+                        event = None
+                    elif self._closed:
+                        return
+                    else:
+                        event, seq = self._event, self._seq
+                # A comment line keeps proxies from timing out and lets us notice closed connections
+                yield event if event is not None else b": keepalive\n\n"
+        finally:
+            SSE_CLIENTS.dec()
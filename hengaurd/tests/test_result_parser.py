@@ -0,0 +1,78 @@
+import logging
+import numpy as np
+from inference.result_parser import Detections, parse_results
+
+class FakeTensor:
+    """Stands in for a torch tensor: only .cpu().numpy() is used."""
+
+    def __init__(self, array):
+        self.array = np.asarray(array)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+class FakeBoxes:
+    def __init__(self, data, ids=True):
+        self.data = data
+        self.id = FakeTensor([row[4] for row in ROWS]) if ids else None
+
+class FakeResult:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+ROWS = [
+    [10.7, 20.2, 30.9, 41.5, 3, 0.9, 0],
+    [100, 100, 201, 151, 7, 0.55, 1],
+]
+
+def assert_empty(dets):
+    assert len(dets) == 0
+    assert dets.boxes.shape == (0, 4)
+    assert dets.centers.shape == (0, 2)
+
+def test_empty_results():
+    assert_empty(parse_results([]))
+    assert_empty(parse_results(None))
+    assert_empty(parse_results([FakeResult(None)]))
+
+def test_untracked_boxes_are_dropped():
+    assert_empty(parse_results([FakeResult(FakeBoxes(np.array(ROWS), ids=False))]))
+
+def test_numpy_rows():
+    dets = parse_results([FakeResult(FakeBoxes(np.array(ROWS)))])
+    assert dets.ids.tolist() == [3, 7]
+    assert dets.classes.tolist() == [0, 1]
+    assert np.allclose(dets.confs, [0.9, 0.55])
+
+def test_torch_like_data():
+    dets = parse_results([FakeResult(FakeBoxes(FakeTensor(ROWS)))])
+    assert dets.ids.tolist() == [3, 7]
+    assert dets.boxes.tolist() == [[10, 20, 30, 41], [100, 100, 201, 151]]
+
+def test_detections_pass_through():
+    dets = Detections.from_rows(ROWS)
+    assert parse_results([dets]) is dets
+
+def test_malformed_results_log_and_return_empty(caplog):
+    boxes = FakeBoxes(np.array(ROWS))
+    boxes.data = [[1, 2, 3]]  # not (N, 7)
+    with caplog.at_level(logging.WARNING):
+        assert_empty(parse_results([FakeResult(boxes)], logging.getLogger("test")))
+    assert "Error processing detection results" in caplog.text
+
+def test_from_rows_int32_box_and_center_math():
+    dets = Detections.from_rows(ROWS)
+    assert dets.boxes.dtype == np.int32
+    assert dets.centers.dtype == np.int32
+    assert dets.ids.dtype == np.int64
+    assert dets.classes.dtype == np.int64
+    assert dets.confs.dtype == np.float32
+    # Boxes are truncated to int32 first, centers are the floored midpoint of the int boxes
+    assert dets.centers.tolist() == [[20, 30], [150, 125]]
+
+def test_from_rows_empty_and_flat():
+    assert_empty(Detections.from_rows(np.empty((0, 7))))
+    assert len(Detections.from_rows(ROWS[0])) == 1
@@ -1,11 +1,15 @@
-import cv2
 import sys
 import yaml
-import time
 import os
 from utils.logger import setup_logger
 from inference.detector import Detector
+from inference.keyframes import KeyframeDetector
 from logic.theft_detector import TheftDetector
+from display.overlay_renderer import OverlayRenderer
+from display.viewer import Viewer
+from engine.pipeline import Pipeline
+from engine.sinks import AlertSink, GuiSink
+from engine.sources import FileSource
 
 # ---------------- CONFIG ----------------
 CONFIG_PATH = "config.yaml"
@@ -31,79 +35,31 @@ def main():
         model_cfg = cfg['model']
 
         # Initialize detector and theft logic
-        detector = Detector(model_cfg, logger)
+        detector = Detector({**model_cfg, 'zones': cfg['zones']}, logger)
         theft_logic = TheftDetector(cfg['zones'])
+        renderer = OverlayRenderer(cfg.get('display', {}), logger)
 
-        # Video capture
-        cap = cv2.VideoCapture(SOURCE)
-        if not cap.isOpened():
-            logger.error(f"Cannot open video source: {SOURCE}")
+        # Every frame of the clip is processed, as fast as inference allows
+        try:
+            source = FileSource(SOURCE, logger, pace=False)
+        except RuntimeError as e:
+            logger.error(str(e))
             sys.exit(1)
 
         logger.info(f"Video source opened: {SOURCE}")
         print("Press Q to exit")
 
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret or frame is None:
-                logger.warning("Failed to read frame or end of video reached")
-                break
-
-            # Run detection
-            try:
-                results = detector.detect(frame)
-            except Exception as e:
-                logger.error(f"Detection failed: {e}")
-                results = None
-
-            humans, hens = [], []
-
-            if results:
-                try:
-                    if hasattr(results[0], 'boxes') and getattr(results[0].boxes, 'id', None) is not None:
-                        for box in results[0].boxes:
-                            tid = int(box.id)
-                            cls = int(box.cls)
-                            x1, y1, x2, y2 = map(int, box.xyxy[0])
-                            cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
-                            theft_logic.update_track(tid, cx, cy)
-
-                            if cls == 0:
-                                humans.append((tid, (cx, cy)))
-                            elif cls == 1:
-                                hens.append((cx, cy))
-                except Exception as e:
-                    logger.warning(f"Error processing detection results: {e}")
-
-            # Check theft
-            if theft_logic.detect(humans, hens):
-                cv2.putText(frame, "THEFT DETECTED!", (50, 50),
-                            cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 255), 3)
-                logger.warning("🚨 THEFT DETECTED")
-                print("🚨 THEFT DETECTED")
-
-            # Display frame (use results[0].plot() if available)
-            frame_to_show = frame
-            if results:
-                try:
-                    frame_to_show = results[0].plot()
-                except Exception as e:
-                    logger.warning(f"Plotting detection results failed: {e}")
-
-            try:
-                cv2.imshow(WINDOW_NAME, frame_to_show)
-            except Exception as e:
-                logger.error(f"Failed to show window: {e}")
-                # Save a test frame in case GUI is not available
-                cv2.imwrite("debug_frame.jpg", frame_to_show)
-
-            # Wait key (adjust for slower systems)
-            if cv2.waitKey(30) & 0xFF == ord('q'):
-                logger.info("User requested exit")
-                break
-
-        cap.release()
-        cv2.destroyAllWindows()
+        def on_alert(msg):
+            logger.warning(f"🚨 {msg}")
+            print(f"🚨 {msg}")
+
+        viewer = Viewer(cfg.get('display', {}), logger)
+        sinks = [AlertSink(on_alert), GuiSink(viewer, renderer, WINDOW_NAME)]
+        try:
+            keyframes = KeyframeDetector(cfg.get('keyframes', {}), detector, logger)
+            Pipeline(source, detector, theft_logic, logger, sinks=sinks, keyframes=keyframes, lossless=True).run()
+        finally:
+            viewer.close()
         logger.info("Video processing finished")
 
     except Exception as e: